@@ -1,6 +1,11 @@
 import random
+import numpy as np
 from PIL import Image
 import os
+from comun import NEGRO, ROJO, VERDE, AZUL, UMBRAL, cargar_entradas, cargar_entradas_1bit, codigos_a_imagen
+from apilamiento import apilar, a_codigos
+from bandas import generar_sombras
+from aleatoriedad import FuenteAleatoria
 
 class CBWEVCS_Strict:
     def __init__(self):
@@ -9,23 +14,75 @@ class CBWEVCS_Strict:
         self.BLUE = (0, 0, 255)
         self.BLACK = (0, 0, 0)
         self.COLORS = [self.RED, self.GREEN, self.BLUE]
+        # Mismos colores como códigos de 3 bits (modo vectorizado)
+        self.COLOR_CODES = np.array([ROJO, VERDE, AZUL], dtype=np.uint8)
+        # Esquema (2, 2) con expansión m=2
+        self.n = 2
+        self.m = 2
+        self._random = random.Random()
 
     def _get_random_color(self):
-        return random.choice(self.COLORS)
+        return self._random.choice(self.COLORS)
 
     def _get_different_color(self, color_to_avoid):
         candidates = [c for c in self.COLORS if c != color_to_avoid]
-        return random.choice(candidates)
-
-    def process_images(self, secret_path, cover1_path, cover2_path):
+        return self._random.choice(candidates)
+
+    def process_images(self, secret_path, cover1_path, cover2_path, vectorized=True, workers=1, rng=None, progreso=None,
+                       umbral=UMBRAL):
+        rng = rng or FuenteAleatoria()
+        if vectorized:
+            return self._process_images_vectorized(secret_path, cover1_path, cover2_path, workers, rng, progreso, umbral)
+        return self._process_images_pixel(secret_path, cover1_path, cover2_path, rng, umbral)
+
+    def _process_images_vectorized(self, secret_path, cover1_path, cover2_path, workers, rng, progreso, umbral):
+        """
+        Misma lógica de columnas que el modo píxel a píxel, pero con arrays NumPy.
+        La distribución de salida es idéntica: elegir "un color distinto" de 3
+        equivale a sumar un desplazamiento aleatorio de {1, 2} módulo 3.
+        """
+        s, (c1, c2) = cargar_entradas(secret_path, [cover1_path, cover2_path], umbral)
+
+        print("Procesando con lógica estricta de Columnas (vectorizado)...")
+
+        out1, out2 = generar_sombras(self, s, [c1, c2], workers, fuente=rng, progreso=progreso)
+        return codigos_a_imagen(out1), codigos_a_imagen(out2)
+
+    def generate_band(self, s, covers, rng):
+        """
+        Genera una banda de filas de ambas sombras.
+        s y covers: arrays booleanos (filas, ancho). Devuelve dos arrays de códigos (filas, ancho*2).
+        """
+        c1, c2 = covers
+        height, width = s.shape
+
+        # Todos los sorteos en una sola llamada, (filas, 4, ancho):
+        # [0] color S1 col1, [1] desplazamiento col1, [2] color S1 col2, [3] desplazamiento col2
+        highs = np.array([3, 2, 3, 2], dtype=np.uint8).reshape(4, 1)
+        draws = rng.enteros(highs, (4, width))
+
+        # COLUMNA 1: EL SECRETO (blanco -> coinciden, negro -> difieren)
+        s1_c1 = draws[:, 0]
+        s2_c1 = np.where(s, s1_c1, (s1_c1 + 1 + draws[:, 1]) % 3)
+
+        # COLUMNA 2: RUIDO DE FONDO (siempre difieren) + CUBIERTAS (negra -> NEGRO)
+        s1_c2 = draws[:, 2]
+        s2_c2 = (s1_c2 + 1 + draws[:, 3]) % 3
+
+        out1 = np.empty((height, width * 2), dtype=np.uint8)
+        out2 = np.empty((height, width * 2), dtype=np.uint8)
+        out1[:, 0::2] = self.COLOR_CODES[s1_c1]
+        out2[:, 0::2] = self.COLOR_CODES[s2_c1]
+        out1[:, 1::2] = np.where(c1, self.COLOR_CODES[s1_c2], NEGRO)
+        out2[:, 1::2] = np.where(c2, self.COLOR_CODES[s2_c2], NEGRO)
+
+        return out1, out2
+
+    def _process_images_pixel(self, secret_path, cover1_path, cover2_path, rng, umbral):
+        self._random = rng.random_python()
         # Cargar y convertir a binario estricto (1-bit)
-        secret_img = Image.open(secret_path).convert('1')
-        cover1_img = Image.open(cover1_path).convert('1')
-        cover2_img = Image.open(cover2_path).convert('1')
-
+        secret_img, (cover1_img, cover2_img) = cargar_entradas_1bit(secret_path, [cover1_path, cover2_path], umbral)
         width, height = secret_img.size
-        cover1_img = cover1_img.resize((width, height))
-        cover2_img = cover2_img.resize((width, height))
 
         # Imagen de salida: Ancho x 2 (Expansión m=2)
         out_shadow1 = Image.new('RGB', (width * 2, height))
@@ -90,29 +147,14 @@ class CBWEVCS_Strict:
                 out2_pixels[col1_x, y] = px_s2_c1
                 out2_pixels[col2_x, y] = px_s2_c2
 
-        return out_shadow1, out_shadow2
-
-    def simulate_stacking(self, shadow1, shadow2):
-        width, height = shadow1.size
-        stacked = Image.new('RGB', (width, height))
-        s1_data = shadow1.load()
-        s2_data = shadow2.load()
-        stacked_data = stacked.load()
+        # Mismo modo de imagen ('P') que el camino vectorizado
+        return codigos_a_imagen(a_codigos(out_shadow1)), codigos_a_imagen(a_codigos(out_shadow2))
 
-        for y in range(height):
-            for x in range(width):
-                p1 = s1_data[x, y]
-                p2 = s2_data[x, y]
-                
-                # Lógica física: Si alguno es negro o son diferentes colores -> NEGRO
-                if p1 == self.BLACK or p2 == self.BLACK:
-                    stacked_data[x, y] = self.BLACK
-                elif p1 != p2: # Bloqueo de luz por colores distintos
-                    stacked_data[x, y] = self.BLACK
-                else: # Son iguales y tienen color -> Pasa la luz
-                    stacked_data[x, y] = p1
-                    
-        return stacked
+    def simulate_stacking(self, shadow1, shadow2, *others):
+        """
+        Lógica física: Si alguno es negro o son diferentes colores -> NEGRO.
+        """
+        return apilar([shadow1, shadow2, *others], exacto=True)
 
 if __name__ == "__main__":
     try:
@@ -1,6 +1,12 @@
 import random
+import numpy as np
 from PIL import Image
 import os
+from comun import (NEGRO, ROJO, VERDE, AZUL, CIAN, MAGENTA, AMARILLO, UMBRAL, cargar_entradas, cargar_entradas_1bit,
+                   codigos_a_imagen)
+from apilamiento import apilar, a_codigos
+from bandas import generar_sombras
+from aleatoriedad import FuenteAleatoria
 
 class CBWEVCS_Construction2:
     def __init__(self):
@@ -28,23 +34,73 @@ class CBWEVCS_Construction2:
             self.BLACK: self.BLACK # El complementario de negro se trata como negro en este contexto lógico
         }
 
+        # 3. Versión indexada (modo vectorizado): cada color de S(1) es un índice 0..5
+        # y el complementario es una tabla fija de 6 entradas (mismo orden que COLORS).
+        self.COLOR_CODES = np.array([ROJO, VERDE, AZUL, CIAN, MAGENTA, AMARILLO], dtype=np.uint8)
+        self.COMPLEMENT_INDEX = np.array([3, 4, 5, 0, 1, 2], dtype=np.uint8)
+
+        # Esquema (2, 2) con expansión m=2
+        self.n = 2
+        self.m = 2
+        self._random = random.Random()
+
     def _get_random_color(self):
         """Elige un color aleatorio de S(1)"""
-        return random.choice(self.COLORS)
+        return self._random.choice(self.COLORS)
 
     def _get_complementary(self, color):
         """Devuelve el color complementario (s barra) según el paper"""
         return self.COMPLEMENTS.get(color, self.BLACK)
 
-    def process_images(self, secret_path, cover1_path, cover2_path):
-        # Cargar imágenes
-        secret_img = Image.open(secret_path).convert('1')
-        cover1_img = Image.open(cover1_path).convert('1')
-        cover2_img = Image.open(cover2_path).convert('1')
+    def process_images(self, secret_path, cover1_path, cover2_path, vectorized=True, workers=1, rng=None, progreso=None,
+                       umbral=UMBRAL):
+        rng = rng or FuenteAleatoria()
+        if vectorized:
+            return self._process_images_vectorized(secret_path, cover1_path, cover2_path, workers, rng, progreso, umbral)
+        return self._process_images_pixel(secret_path, cover1_path, cover2_path, rng, umbral)
+
+    def _process_images_vectorized(self, secret_path, cover1_path, cover2_path, workers, rng, progreso, umbral):
+        """
+        Construcción 2 con índices de paleta: sin tuplas ni búsquedas en diccionario,
+        ambas sombras se construyen como arrays completos en una sola pasada.
+        """
+        s, (c1, c2) = cargar_entradas(secret_path, [cover1_path, cover2_path], umbral)
+
+        print("Procesando Construcción 2 (Colores Complementarios, vectorizado)...")
+
+        out1, out2 = generar_sombras(self, s, [c1, c2], workers, fuente=rng, progreso=progreso)
+        return codigos_a_imagen(out1), codigos_a_imagen(out2)
+
+    def generate_band(self, s, covers, rng):
+        """Una banda de filas de ambas sombras, como arrays de códigos (filas, ancho*2)."""
+        c1, c2 = covers
+        height, width = s.shape
+
+        # (filas, 2, ancho): [0] color S1 columna 1, [1] color base S1 columna 2
+        draws = rng.enteros(6, (2, width))
+
+        # COLUMNA 1: Secreto blanco -> igual, secreto negro -> complementario
+        s1_c1 = draws[:, 0]
+        s2_c1 = np.where(s, s1_c1, self.COMPLEMENT_INDEX[s1_c1])
+
+        # COLUMNA 2: Fondo siempre complementario (ruido), las cubiertas negras fuerzan NEGRO
+        s1_c2 = draws[:, 1]
+        s2_c2 = self.COMPLEMENT_INDEX[s1_c2]
 
+        out1 = np.empty((height, width * 2), dtype=np.uint8)
+        out2 = np.empty((height, width * 2), dtype=np.uint8)
+        out1[:, 0::2] = self.COLOR_CODES[s1_c1]
+        out2[:, 0::2] = self.COLOR_CODES[s2_c1]
+        out1[:, 1::2] = np.where(c1, self.COLOR_CODES[s1_c2], NEGRO)
+        out2[:, 1::2] = np.where(c2, self.COLOR_CODES[s2_c2], NEGRO)
+
+        return out1, out2
+
+    def _process_images_pixel(self, secret_path, cover1_path, cover2_path, rng, umbral):
+        self._random = rng.random_python()
+        # Cargar imágenes
+        secret_img, (cover1_img, cover2_img) = cargar_entradas_1bit(secret_path, [cover1_path, cover2_path], umbral)
         width, height = secret_img.size
-        cover1_img = cover1_img.resize((width, height))
-        cover2_img = cover2_img.resize((width, height))
 
         # Expansión m=2
         out_shadow1 = Image.new('RGB', (width * 2, height))
@@ -133,36 +189,15 @@ class CBWEVCS_Construction2:
                 out2_pixels[col1_x, y] = px_s2_c1
                 out2_pixels[col2_x, y] = px_s2_c2
 
-        return out_shadow1, out_shadow2
+        # Mismo modo de imagen ('P') que el camino vectorizado
+        return codigos_a_imagen(a_codigos(out_shadow1)), codigos_a_imagen(a_codigos(out_shadow2))
 
-    def simulate_stacking(self, shadow1, shadow2):
-        width, height = shadow1.size
-        stacked = Image.new('RGB', (width, height))
-        s1_data = shadow1.load()
-        s2_data = shadow2.load()
-        stacked_data = stacked.load()
-
-        for y in range(height):
-            for x in range(width):
-                p1 = s1_data[x, y]
-                p2 = s2_data[x, y]
-                
-                # En simulación RGB, dos colores complementarios (ej. Rojo + Cian) 
-                # no hacen negro automáticamente en suma aditiva digital simple,
-                # pero en la lógica de transparencias (sustractiva/filtros) SÍ bloquean todo el espectro.
-                # Rojo deja pasar solo R. Cian deja pasar G y B. 
-                # Rojo + Cian = Bloqueo total (Negro).
-                
-                if p1 == self.BLACK or p2 == self.BLACK:
-                    stacked_data[x, y] = self.BLACK
-                elif p1 == p2:
-                    stacked_data[x, y] = p1
-                else:
-                    # Asumimos bloqueo ideal: cualquier diferencia bloquea luz
-                    # O específicamente si son complementarios
-                    stacked_data[x, y] = self.BLACK 
-                    
-        return stacked
+    def simulate_stacking(self, shadow1, shadow2, *others):
+        """
+        Rojo deja pasar solo R. Cian deja pasar G y B.
+        Rojo + Cian = Bloqueo total (Negro): asumimos bloqueo ideal, cualquier diferencia bloquea luz.
+        """
+        return apilar([shadow1, shadow2, *others], exacto=True)
 
 if __name__ == "__main__":
     try:
@@ -1,6 +1,11 @@
 import random
+import numpy as np
 from PIL import Image
 import os
+from comun import NEGRO, CIAN, ROJO, UMBRAL, cargar_entradas, cargar_entradas_1bit, codigos_a_imagen
+from apilamiento import apilar, a_codigos
+from bandas import generar_sombras
+from aleatoriedad import FuenteAleatoria
 
 class CBWEVCS_Construction3:
     def __init__(self):
@@ -12,10 +17,17 @@ class CBWEVCS_Construction3:
         
         # Nuestro universo de colores es binario: O es Cian, O es Rojo.
         self.PAIR = [self.CYAN, self.RED]
+        # Modo bits: 0 = Cian, 1 = Rojo (mismo orden que PAIR)
+        self.PAIR_CODES = np.array([CIAN, ROJO], dtype=np.uint8)
+
+        # Esquema (2, 2) con expansión m=2
+        self.n = 2
+        self.m = 2
+        self._random = random.Random()
 
     def _get_random_pair_color(self):
         """Elige aleatoriamente uno de los dos colores."""
-        return random.choice(self.PAIR)
+        return self._random.choice(self.PAIR)
 
     def _get_other_color(self, color):
         """
@@ -27,15 +39,58 @@ class CBWEVCS_Construction3:
         else:
             return self.CYAN
 
-    def process_images(self, secret_path, cover1_path, cover2_path):
-        # Cargar imágenes (B/N estricto)
-        secret_img = Image.open(secret_path).convert('1')
-        cover1_img = Image.open(cover1_path).convert('1')
-        cover2_img = Image.open(cover2_path).convert('1')
+    def process_images(self, secret_path, cover1_path, cover2_path, vectorized=True, workers=1, rng=None, progreso=None,
+                       umbral=UMBRAL):
+        rng = rng or FuenteAleatoria()
+        if vectorized:
+            return self._process_images_vectorized(secret_path, cover1_path, cover2_path, workers, rng, progreso, umbral)
+        return self._process_images_pixel(secret_path, cover1_path, cover2_path, rng, umbral)
+
+    def _process_images_vectorized(self, secret_path, cover1_path, cover2_path, workers, rng, progreso, umbral):
+        """
+        Motor a nivel de bit. Con solo dos colores, cada sub-píxel es un bit:
+        Sombra 1 = bits aleatorios, Sombra 2 = Sombra 1 XOR "debe cambiar".
+        El XOR se hace sobre los bits empaquetados y solo al final se pasa a RGB.
+        """
+        s, (c1, c2) = cargar_entradas(secret_path, [cover1_path, cover2_path], umbral)
+
+        print("Generando Construcción 3 (Par Cian/Rojo, bits empaquetados)...")
+
+        out1, out2 = generar_sombras(self, s, [c1, c2], workers, fuente=rng, progreso=progreso)
+        return codigos_a_imagen(out1), codigos_a_imagen(out2)
+
+    def generate_band(self, s, covers, rng):
+        """Una banda de filas de ambas sombras (arrays de códigos de ancho*2 columnas)."""
+        c1, c2 = covers
+        height, width = s.shape
+
+        # Plano "debe cambiar" con la misma disposición que la sombra (col1, col2, col1, col2...):
+        # Columna 1 cambia solo si el secreto es negro, columna 2 cambia siempre (ruido de fondo).
+        flip = np.ones((height, width * 2), dtype=bool)
+        flip[:, 0::2] = ~s
+        flip_packed = np.packbits(flip, axis=1)
+
+        # Bits aleatorios generados de 64 en 64 (cada fila con sus propias palabras)
+        n_bytes = flip_packed.shape[1]
+        words = rng.palabras((-(-n_bytes // 8),))
+        random_packed = words.view(np.uint8)[:, :n_bytes]
+
+        bits1 = np.unpackbits(random_packed, axis=1, count=width * 2)
+        bits2 = np.unpackbits(random_packed ^ flip_packed, axis=1, count=width * 2)
 
+        # Expansión a color, con las cubiertas negras forzando NEGRO en la columna 2
+        out1 = self.PAIR_CODES[bits1]
+        out2 = self.PAIR_CODES[bits2]
+        out1[:, 1::2][~c1] = NEGRO
+        out2[:, 1::2][~c2] = NEGRO
+
+        return out1, out2
+
+    def _process_images_pixel(self, secret_path, cover1_path, cover2_path, rng, umbral):
+        self._random = rng.random_python()
+        # Cargar imágenes (B/N estricto)
+        secret_img, (cover1_img, cover2_img) = cargar_entradas_1bit(secret_path, [cover1_path, cover2_path], umbral)
         width, height = secret_img.size
-        cover1_img = cover1_img.resize((width, height))
-        cover2_img = cover2_img.resize((width, height))
 
         # Expansión m=2
         out_shadow1 = Image.new('RGB', (width * 2, height))
@@ -112,33 +167,17 @@ class CBWEVCS_Construction3:
                 out2_pixels[col1_x, y] = px_s2_c1
                 out2_pixels[col2_x, y] = px_s2_c2
 
-        return out_shadow1, out_shadow2
+        # Mismo modo de imagen ('P') que el camino vectorizado
+        return codigos_a_imagen(a_codigos(out_shadow1)), codigos_a_imagen(a_codigos(out_shadow2))
 
-    def simulate_stacking(self, shadow1, shadow2):
-        width, height = shadow1.size
-        stacked = Image.new('RGB', (width, height))
-        s1_data = shadow1.load()
-        s2_data = shadow2.load()
-        stacked_data = stacked.load()
-
-        for y in range(height):
-            for x in range(width):
-                p1 = s1_data[x, y]
-                p2 = s2_data[x, y]
-                
-                # Reglas de física de luz para Construcción 3:
-                # 1. El negro bloquea todo.
-                if p1 == self.BLACK or p2 == self.BLACK:
-                    stacked_data[x, y] = self.BLACK
-                # 2. Colores iguales pasan (Cian+Cian=Cian, Rojo+Rojo=Rojo)
-                elif p1 == p2:
-                    stacked_data[x, y] = p1
-                # 3. Colores diferentes bloquean (Cian+Rojo = Negro)
-                # Al ser un par complementario de alto contraste, actúan como negro.
-                else:
-                    stacked_data[x, y] = self.BLACK
-                    
-        return stacked
+    def simulate_stacking(self, shadow1, shadow2, *others):
+        """
+        Reglas de física de luz para Construcción 3:
+        1. El negro bloquea todo.
+        2. Colores iguales pasan (Cian+Cian=Cian, Rojo+Rojo=Rojo).
+        3. Colores diferentes bloquean (Cian+Rojo = Negro).
+        """
+        return apilar([shadow1, shadow2, *others], exacto=True)
 
 if __name__ == "__main__":
     try:
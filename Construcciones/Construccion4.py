@@ -1,8 +1,15 @@
 import random
 import math
 import itertools
+import numpy as np
 from PIL import Image
 import os
+from comun import (ROJO, VERDE, AZUL, UMBRAL, cargar_entradas, cargar_entradas_1bit, codigos_a_imagen,
+                   plantillas_cubierta, rellenar_cubiertas)
+from apilamiento import apilar, a_codigos
+from bandas import generar_sombras
+from aleatoriedad import FuenteAleatoria
+from metricas import tramo
 
 class CBWEVCS_Construction4_Secure:
     def __init__(self, n_participants):
@@ -26,9 +33,19 @@ class CBWEVCS_Construction4_Secure:
         # Ej: Para n=3, m1=1 -> [(R), (G), (B)]
         self.all_vectors = list(itertools.product(self.BASE_COLORS, repeat=self.m1))
 
+        # Modo vectorizado: los mismos vectores como códigos de color, shape (3^m1, m1)
+        self.BASE_CODES = np.array([ROJO, VERDE, AZUL], dtype=np.uint8)
+        self.VECTOR_CODES = np.array(list(itertools.product(self.BASE_CODES, repeat=self.m1)), dtype=np.uint8)
+        # Tipo entero más pequeño para los índices de vector (uint8 mientras 3^m1 <= 256)
+        self.INDEX_DTYPE = np.min_scalar_type(len(self.VECTOR_CODES) - 1)
+        # Bloque de cubierta de cada usuario para cubierta negra / blanca, shape (n, 2, m2)
+        self.COVER_TEMPLATES = plantillas_cubierta(self.n, self.m2)
+
+        self._random = random.Random()
+
     def _get_random_vector(self):
         """Devuelve un vector de color aleatorio"""
-        return random.choice(self.all_vectors)
+        return self._random.choice(self.all_vectors)
 
     def _get_shuffled_distribution(self):
         """
@@ -38,20 +55,66 @@ class CBWEVCS_Construction4_Secure:
         # Seleccionamos 'n' vectores distintos al azar de los disponibles
         # Nota: Para n=3, m1=1, tomamos los 3 colores (R,G,B) y los barajamos.
         # Si n < 3^m1, tomamos una muestra aleatoria.
-        selected = random.sample(self.all_vectors, self.n)
+        selected = self._random.sample(self.all_vectors, self.n)
         return selected
 
-    def process_images(self, secret_path, cover_paths):
+    def _get_shuffled_distributions(self, black, rng):
+        """
+        Versión por lotes de _get_shuffled_distribution: para todos los píxeles negros
+        (máscara 'black') a la vez devuelve (píxeles, n) índices de vectores DISTINTOS
+        en orden aleatorio. Una permutación aleatoria por píxel de la que nos quedamos los n primeros.
+        """
+        identity = np.arange(len(self.all_vectors), dtype=np.intp)
+        return rng.permutaciones(identity, mascara=black)[:, :self.n]
+
+    def process_images(self, secret_path, cover_paths, vectorized=True, workers=1, rng=None, progreso=None,
+                       umbral=UMBRAL):
         if len(cover_paths) != self.n:
             print(f"Error: Se requieren {self.n} cubiertas.")
             return []
+        rng = rng or FuenteAleatoria()
+        if not vectorized:
+            return self._process_images_pixel(secret_path, cover_paths, rng, umbral)
+
+        s, covers = cargar_entradas(secret_path, cover_paths, umbral)
+
+        print("Procesando con permutación aleatoria por lotes (Seguridad V-2)...")
+
+        shadows = generar_sombras(self, s, covers, workers, fuente=rng, progreso=progreso)
+        return [codigos_a_imagen(codes) for codes in shadows]
 
+    def generate_band(self, s, covers, rng):
+        """
+        Genera una banda de filas de las n sombras.
+        Devuelve un array de códigos de color (n, filas, ancho*m).
+        """
+        height, width = s.shape
+
+        with tramo("bloque_secreto"):
+            # PARTE 1: BLOQUE DEL SECRETO (Ancho m1), como índice de vector por píxel y usuario (alto, ancho, n)
+            # Blanco: un único sorteo por píxel, compartido por todos los usuarios
+            white = np.zeros((height, width), dtype=self.INDEX_DTYPE)
+            white[s] = rng.enteros(len(self.all_vectors), mascara=s, dtype=np.intp)
+            # Negro: n vectores distintos y barajados por píxel, todos en una operación
+            black = np.zeros((height, width, self.n), dtype=self.INDEX_DTYPE)
+            black[~s] = self._get_shuffled_distributions(~s, rng)
+            vector_idx = np.where(s[..., None], white[..., None], black)
+
+            # Un solo gather de la tabla de códigos, ya en el orden (n, alto, ancho) de la salida
+            out = np.empty((self.n, height, width, self.m), dtype=np.uint8)
+            out[..., :self.m1] = np.take(self.VECTOR_CODES, np.ascontiguousarray(np.moveaxis(vector_idx, 2, 0)), axis=0)
+
+        with tramo("bloque_cubierta"):
+            # PARTE 2: BLOQUE DE CUBIERTAS (Ancho m2), una plantilla entera por píxel
+            rellenar_cubiertas(out[..., self.m1:], self.COVER_TEMPLATES, covers)
+
+        return out.reshape(self.n, height, width * self.m)
+
+    def _process_images_pixel(self, secret_path, cover_paths, rng, umbral):
+        self._random = rng.random_python()
         # Cargar imágenes (B/N)
-        secret_img = Image.open(secret_path).convert('1')
-        covers = [Image.open(p).convert('1') for p in cover_paths]
-        
+        secret_img, covers = cargar_entradas_1bit(secret_path, cover_paths, umbral)
         width, height = secret_img.size
-        covers = [c.resize((width, height)) for c in covers]
 
         # Lienzos de salida
         shadows = [Image.new('RGB', (width * self.m, height)) for _ in range(self.n)]
@@ -120,26 +183,14 @@ class CBWEVCS_Construction4_Secure:
                         
                         shadow_pixels_list[i][offset_x + col_idx, y] = pixel_val
 
-        return shadows
+        # Mismo modo de imagen ('P') que el camino vectorizado
+        return [codigos_a_imagen(a_codigos(shadow)) for shadow in shadows]
 
-    def simulate_stacking(self, shadow_a, shadow_b):
-        w, h = shadow_a.size
-        stacked = Image.new('RGB', (w, h))
-        da = shadow_a.load()
-        db = shadow_b.load()
-        ds = stacked.load()
-        
-        for y in range(h):
-            for x in range(w):
-                pa = da[x, y]
-                pb = db[x, y]
-                if pa == self.BLACK or pb == self.BLACK:
-                    ds[x, y] = self.BLACK
-                elif pa == pb:
-                    ds[x, y] = pa
-                else:
-                    ds[x, y] = self.BLACK
-        return stacked
+    def simulate_stacking(self, shadow_a, shadow_b, *others):
+        """
+        Negro o colores distintos -> NEGRO. Colores iguales -> pasa la luz.
+        """
+        return apilar([shadow_a, shadow_b, *others], exacto=True)
 
 if __name__ == "__main__":
     N = 3 # Número de participantes (AJUSTAR SEGÚN NECESIDAD)
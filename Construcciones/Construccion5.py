@@ -1,7 +1,14 @@
 import random
 import math
+import numpy as np
 from PIL import Image
 import os
+from comun import (ROJO, VERDE, AZUL, UMBRAL, cargar_entradas, cargar_entradas_1bit, codigos_a_imagen,
+                   plantillas_cubierta, rellenar_cubiertas)
+from apilamiento import apilar, a_codigos
+from bandas import generar_sombras
+from aleatoriedad import FuenteAleatoria
+from metricas import tramo
 
 class CBWEVCS_Construction5_PB:
     def __init__(self, n_participants):
@@ -23,9 +30,17 @@ class CBWEVCS_Construction5_PB:
         
         print(f"Construcción 5 Perfect Black (n={self.n}): Expansión m={self.m} (Bloques de {self.block_size})")
 
+        # Modo vectorizado: base cíclica R,G,B,R... de los n usuarios, construida una sola vez
+        self.BASE_CODES = np.array([ROJO, VERDE, AZUL], dtype=np.uint8)
+        self.CYCLIC_CODES = self.BASE_CODES[np.arange(self.n) % 3]
+        # Bloque de cubierta de cada usuario para cubierta negra / blanca, shape (n, 2, block_size)
+        self.COVER_TEMPLATES = plantillas_cubierta(self.n, self.block_size)
+
+        self._random = random.Random()
+
     def _get_random_vector(self, length):
         """Genera un vector aleatorio de colores de longitud 'length'"""
-        return [random.choice(self.BASE_COLORS) for _ in range(length)]
+        return [self._random.choice(self.BASE_COLORS) for _ in range(length)]
 
     def _get_balanced_shuffled_vectors(self, length):
         """
@@ -48,24 +63,54 @@ class CBWEVCS_Construction5_PB:
         for k in range(length):
             # Para la columna 'k' del bloque, barajamos la asignación de colores
             col_colors = base_colors[:]
-            random.shuffle(col_colors)
+            self._random.shuffle(col_colors)
             
             for i in range(self.n):
                 vectors[i][k] = col_colors[i]
                 
         return vectors
 
-    def process_images(self, secret_path, cover_paths):
+    def process_images(self, secret_path, cover_paths, vectorized=True, workers=1, rng=None, progreso=None,
+                       umbral=UMBRAL):
         if len(cover_paths) != self.n:
             print(f"Error: Se requieren {self.n} cubiertas.")
             return []
+        rng = rng or FuenteAleatoria()
+        if not vectorized:
+            return self._process_images_pixel(secret_path, cover_paths, rng, umbral)
+
+        s, covers = cargar_entradas(secret_path, cover_paths, umbral)
+
+        print("Procesando Construcción 5 (PB, vectorizado)...")
+
+        shadows = generar_sombras(self, s, covers, workers, fuente=rng, progreso=progreso)
+        return [codigos_a_imagen(codes) for codes in shadows]
+
+    def generate_band(self, s, covers, rng):
+        """Genera una banda de filas de las n sombras: array de códigos (n, filas, ancho*m)."""
+        height, width = s.shape
+        out = np.empty((self.n, height, width, self.m), dtype=np.uint8)
+        secret_block = out[..., :self.block_size]
+
+        with tramo("bloque_secreto"):
+            # BLOQUE 1, CASO BLANCO: un vector aleatorio por píxel, el mismo para todos
+            secret_block[:, s] = self.BASE_CODES[rng.enteros(3, (self.block_size,), mascara=s)]
+
+            # BLOQUE 1, CASO NEGRO: la base cíclica barajada para cada (píxel, columna) en un solo paso
+            shuffled = rng.permutaciones(self.CYCLIC_CODES, (self.block_size,), mascara=~s)
+            secret_block[:, ~s] = np.moveaxis(shuffled, 2, 0)
 
+        with tramo("bloque_cubierta"):
+            # BLOQUE 2: CUBIERTAS, una plantilla entera por píxel
+            rellenar_cubiertas(out[..., self.block_size:], self.COVER_TEMPLATES, covers)
+
+        return out.reshape(self.n, height, width * self.m)
+
+    def _process_images_pixel(self, secret_path, cover_paths, rng, umbral):
+        self._random = rng.random_python()
         # Cargar imágenes (B/N)
-        secret_img = Image.open(secret_path).convert('1')
-        covers = [Image.open(p).convert('1') for p in cover_paths]
-        
+        secret_img, covers = cargar_entradas_1bit(secret_path, cover_paths, umbral)
         width, height = secret_img.size
-        covers = [c.resize((width, height)) for c in covers]
 
         # Lienzos de salida
         shadows = [Image.new('RGB', (width * self.m, height)) for _ in range(self.n)]
@@ -129,26 +174,14 @@ class CBWEVCS_Construction5_PB:
                         
                         shadow_pixels_list[i][offset_x + col_idx, y] = pixel_val
 
-        return shadows
+        # Mismo modo de imagen ('P') que el camino vectorizado
+        return [codigos_a_imagen(a_codigos(shadow)) for shadow in shadows]
 
-    def simulate_stacking(self, shadow_a, shadow_b):
-        w, h = shadow_a.size
-        stacked = Image.new('RGB', (w, h))
-        da = shadow_a.load()
-        db = shadow_b.load()
-        ds = stacked.load()
-        
-        for y in range(h):
-            for x in range(w):
-                pa = da[x, y]
-                pb = db[x, y]
-                if pa == self.BLACK or pb == self.BLACK:
-                    ds[x, y] = self.BLACK
-                elif pa == pb:
-                    ds[x, y] = pa
-                else:
-                    ds[x, y] = self.BLACK
-        return stacked
+    def simulate_stacking(self, shadow_a, shadow_b, *others):
+        """
+        Negro o colores distintos -> NEGRO. Colores iguales -> pasa la luz.
+        """
+        return apilar([shadow_a, shadow_b, *others], exacto=True)
 
 if __name__ == "__main__":
     # --- CONFIGURACIÓN ---
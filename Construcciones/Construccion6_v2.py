@@ -2,7 +2,16 @@ import random
 import itertools
 import math
 import os
+import threading
+import numpy as np
 from PIL import Image
+from comun import (BLANCO, UMBRAL, cargar_entradas, cargar_entradas_1bit, codigos_a_imagen, plantillas_cubierta,
+                   rellenar_cubiertas)
+from apilamiento import apilar
+from bandas import generar_sombras
+from aleatoriedad import FuenteAleatoria
+from metricas import tramo
+from bases import BASE_CLASICA, BASE_MINIMA, columnas, columnas_base, pesos_base, pesos_clasicos
 
 # ==========================================
 # CONFIGURACIÓN
@@ -12,13 +21,145 @@ N_PARTICIPANTS = 4  # Total participantes
 
 # Calidad de la cubierta (Mayor número = Cubierta más nítida, imagen más ancha)
 COVER_REPETITION = 3 
+
+# Carpeta donde se guardan las matrices base entre ejecuciones
+BASIS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_bases")
+# Elementos máximos de la matriz de permutaciones por lote (acota la memoria)
+PERMUTATION_BATCH = 1 << 22
 # ==========================================
 
+def _mask_dtype(n):
+    """Entero sin signo más pequeño capaz de guardar una máscara de n usuarios."""
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError(f"n={n} demasiado grande (máximo 64 participantes).")
+
+def build_basis(k, n):
+    """
+    Construye las matrices base de (k, n) como máscaras de bits, shape (2, columnas).
+    Mismo orden que el algoritmo original: por subconjunto de k usuarios, todas las
+    columnas de k bits con paridad par (blanco) o impar (negro), más el relleno.
+    """
+    print(f"Calculando matrices combinatorias para ({k}, {n})...")
+    dtype = _mask_dtype(n)
+
+    all_k_bits = np.array(list(itertools.product([0, 1], repeat=k)), dtype=np.uint64)
+    parity = all_k_bits.sum(axis=1) % 2
+    subsets = np.array(list(itertools.combinations(range(n), k)), dtype=np.uint64)
+
+    def masks_for(block_bits):
+        # (subconjuntos, columnas_bloque): OR de (bit << usuario) para cada usuario del subconjunto
+        shifted = block_bits[None, :, :] << subsets[:, None, :]
+        return np.bitwise_or.reduce(shifted, axis=2).reshape(-1)
+
+    white = masks_for(all_k_bits[parity == 0])
+    black = masks_for(all_k_bits[parity == 1])
+
+    padding = (3 - (white.size % 3)) % 3
+    filler = np.full(padding, (1 << n) - 1, dtype=np.uint64)
+    basis = np.stack([np.concatenate([black, filler]), np.concatenate([white, filler])])
+    return basis.astype(dtype)
+
+def build_symmetric_basis(n, weights):
+    """
+    Matrices base (2, columnas) a partir de los pesos de bases.py: cada máscara de t
+    usuarios negros va d_t veces en la base blanca (d_t > 0) o |d_t| en la negra.
+    """
+    white, black = [], []
+    for t, d in enumerate(weights):
+        masks = [sum(1 << u for u in users) for users in itertools.combinations(range(n), t)]
+        (white if d > 0 else black).extend(masks * abs(d))
+
+    padding = (3 - (len(white) % 3)) % 3
+    filler = [(1 << n) - 1] * padding
+    return np.array([black + filler, white + filler], dtype=_mask_dtype(n))
+
+def _hamming_weights(masks):
+    """Número de usuarios negros (bits a 1) de cada máscara."""
+    as_bytes = masks.astype('<u8').view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1)
+
+def basis_matches_weights(basis, n, weights):
+    """
+    True si unas matrices base (p. ej. leídas de la caché) son las de 'weights':
+    mismo número de columnas, columnas de relleno todo negro y, en cada base, tantas
+    columnas de t usuarios negros como pide d_t. Las bases clásica y simétricas llevan
+    cada máscara de t usuarios el mismo número de veces, así que basta con contarlas.
+    """
+    raw_cols = columnas(weights, n)
+    padding = (3 - raw_cols % 3) % 3
+    if basis.ndim != 2 or basis.shape != (2, raw_cols + padding):
+        return False
+    if np.any(basis[:, raw_cols:] != (1 << n) - 1):
+        return False
+    for row, sign in ((basis[1], 1), (basis[0], -1)):  # [1] = blanca (d_t > 0), [0] = negra (d_t < 0)
+        counts = np.bincount(_hamming_weights(row[:raw_cols]), minlength=n + 1)
+        expected = [abs(d) * math.comb(n, t) if d * sign > 0 else 0 for t, d in enumerate(weights)]
+        if counts.tolist() != expected:
+            return False
+    return True
+
+def check_basis(basis, k, n):
+    """
+    Comprobación por fuerza bruta de unas matrices base, grupo de usuarios a grupo de usuarios:
+    - Seguridad: un grupo de menos de k usuarios ve las mismas columnas (como
+      multiconjunto) con secreto blanco y con secreto negro.
+    - Contraste: un grupo de k o más tiene más columnas transparentes (ningún
+      usuario negro) con secreto blanco que con secreto negro.
+    Devuelve la lista de grupos (tuplas de usuarios) que no cumplen su condición.
+    """
+    black, white = basis.astype(np.uint64)
+    failures = []
+    for q in range(1, n + 1):
+        for group in itertools.combinations(range(n), q):
+            group_mask = np.uint64(sum(1 << u for u in group))
+            seen_white, seen_black = white & group_mask, black & group_mask
+            if q < k:
+                ok = np.array_equal(np.sort(seen_white), np.sort(seen_black))
+            else:
+                ok = np.count_nonzero(seen_white == 0) > np.count_nonzero(seen_black == 0)
+            if not ok:
+                failures.append(group)
+    return failures
+
+def load_or_build_basis(k, n, cache_dir=BASIS_CACHE_DIR, mode=BASE_MINIMA):
+    """
+    Devuelve las matrices base de (k, n), leyéndolas de disco si ya se calcularon antes.
+    mode: BASE_MINIMA (la de menos columnas conocida, ver bases.py) o BASE_CLASICA.
+    Una base en caché que no corresponde a los pesos actuales (p. ej. tras cambiar la
+    tabla de bases.py) se descarta y se vuelve a construir.
+    """
+    weights = pesos_base(k, n, mode)
+    prefix = "basis" if mode == BASE_CLASICA else f"basis_{mode}"
+    path = os.path.join(cache_dir, f"{prefix}_k{k}_n{n}.npy")
+    try:
+        basis = np.load(path)
+        if basis_matches_weights(basis, n, weights):
+            return basis
+    except (OSError, ValueError):
+        pass
+
+    # La clásica conserva el orden de columnas original (mismas sombras para la misma semilla)
+    basis = build_basis(k, n) if weights == pesos_clasicos(k, n) else build_symmetric_basis(n, weights)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Escritura atómica: otro proceso o hilo puede estar leyendo o creando la misma base
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, basis)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # Sin permisos de escritura: se recalculará en la próxima ejecución
+    return basis
+
 class CBWEVCS_Universal_Kn_HighQuality:
-    def __init__(self, k, n, d=1):
+    def __init__(self, k, n, d=1, basis_mode=BASE_MINIMA):
         self.k = k
         self.n = n
         self.d = d
+        # BASE_MINIMA: matrices base de menor expansión (bases.py); BASE_CLASICA: las del paper
+        self.basis_mode = basis_mode
         
         self.RED   = (255, 0, 0)
         self.GREEN = (0, 255, 0)
@@ -27,31 +168,14 @@ class CBWEVCS_Universal_Kn_HighQuality:
         self.TRIAD = [self.RED, self.GREEN, self.BLUE]
         
         # --- 1. MATRICES BASE (B/N) ---
-        print(f"Calculando matrices combinatorias para ({self.k}, {self.n})...")
-        
-        # Generar todas las combinaciones de K bits
-        all_k_bits = list(itertools.product([0, 1], repeat=self.k))
-        block_cols_white = [list(b) for b in all_k_bits if sum(b)%2==0]
-        block_cols_black = [list(b) for b in all_k_bits if sum(b)%2!=0]
-        
-        # Distribuir en N participantes
-        subsets = list(itertools.combinations(range(self.n), self.k))
-        
-        self.final_cols_white = []
-        self.final_cols_black = []
-        
-        for subset_indices in subsets:
-            for col_bits in block_cols_white:
-                full_col = [0] * self.n
-                for idx, bit in zip(subset_indices, col_bits): full_col[idx] = bit
-                self.final_cols_white.append(full_col)
-            for col_bits in block_cols_black:
-                full_col = [0] * self.n
-                for idx, bit in zip(subset_indices, col_bits): full_col[idx] = bit
-                self.final_cols_black.append(full_col)
+        # Cada columna se guarda como máscara de n bits (bit u = 1 -> usuario u NEGRO).
+        # self.basis[0] = columnas para secreto negro, self.basis[1] = secreto blanco,
+        # ya con las columnas de relleno (todo negro) añadidas al final.
+        # Se cargan o construyen al empezar a generar (ver 'basis'), no al instanciar.
+        self._basis = None
 
         # --- 2. EXPANSIÓN ---
-        self.raw_cols = len(self.final_cols_white)
+        self.raw_cols = columnas_base(self.k, self.n, self.basis_mode)
         self.padding = (3 - (self.raw_cols % 3)) % 3
         self.filler_col = [1] * self.n 
         
@@ -59,15 +183,31 @@ class CBWEVCS_Universal_Kn_HighQuality:
         self.m_cover_base = math.ceil(self.n / 3)
         self.m_cover_total = self.m_cover_base * self.d
         self.m = self.m_secret + self.m_cover_total
-        
-        print(f" -> Matriz Base: {self.raw_cols} columnas.")
-        print(f" -> m_secret: {self.m_secret} px | m_cover: {self.m_cover_total} px")
-        print(f" -> ANCHO TOTAL: x{self.m} (Expansión)")
+        # Bloque de cubierta (ya repetido d veces) de cada usuario para cubierta negra / blanca
+        self.COVER_TEMPLATES = plantillas_cubierta(self.n, self.m_cover_base, self.d)
+
+        self._random = random.Random()
+
+    @property
+    def basis(self):
+        if self._basis is None:
+            with tramo("matriz_base"):
+                self._basis = load_or_build_basis(self.k, self.n, mode=self.basis_mode)
+        return self._basis
+
+    def _build_column_lists(self):
+        """Listas de columnas del modo píxel a píxel, derivadas de las máscaras (solo la primera vez)."""
+        if hasattr(self, 'final_cols_white'):
+            return
+        def to_lists(masks):
+            return [[(int(mask) >> u) & 1 for u in range(self.n)] for mask in masks[:self.raw_cols]]
+        self.final_cols_white = to_lists(self.basis[1])
+        self.final_cols_black = to_lists(self.basis[0])
 
     def _generate_secret_pixels(self, is_secret_white):
         cols = self.final_cols_white[:] if is_secret_white else self.final_cols_black[:]
         for _ in range(self.padding): cols.append(self.filler_col)
-        random.shuffle(cols)
+        self._random.shuffle(cols)
         
         user_pixels = [[None]*self.m_secret for _ in range(self.n)]
         for p_idx in range(self.m_secret):
@@ -79,19 +219,76 @@ class CBWEVCS_Universal_Kn_HighQuality:
                 user_pixels[u][p_idx] = (r, g, b)
         return user_pixels
 
-    def process_images(self, secret_path, cover_paths):
+    def process_images(self, secret_path, cover_paths, vectorized=True, workers=1, rng=None, progreso=None,
+                       umbral=UMBRAL):
         if len(cover_paths) != self.n: 
             print(f"Error: Faltan cubiertas. Se esperan {self.n}.")
             return []
+        rng = rng or FuenteAleatoria()
+        if not vectorized:
+            return self._process_images_pixel(secret_path, cover_paths, rng, umbral)
+        try:
+            s, covers = cargar_entradas(secret_path, cover_paths, umbral)
+        except FileNotFoundError: 
+            print("Error: No se encuentran las imágenes (secret.png o covers).")
+            return []
+
+        print("Generando sombras (permutaciones por lotes)...")
+
+        # Matrices base antes de repartir las bandas: viajan ya calculadas a los procesos
+        self.basis
+
+        shadows = generar_sombras(self, s, covers, workers, fuente=rng, progreso=progreso)
+        return [codigos_a_imagen(codes) for codes in shadows]
+
+    def generate_band(self, s, covers, rng):
+        """
+        Genera una banda de filas de las n sombras.
+        Devuelve un array de códigos de color (n, filas, ancho*m).
+        """
+        height, width = s.shape
+
+        # Sombras como códigos de color: (usuario, fila, píxel, sub-píxel)
+        out = np.empty((self.n, height, width, self.m), dtype=np.uint8)
+        with tramo("bloque_secreto"):
+            self._fill_secret_block(s, out[..., :self.m_secret], rng)
+
+        with tramo("bloque_cubierta"):
+            # BLOQUE CUBIERTA (Con repetición d): una plantilla entera por píxel
+            rellenar_cubiertas(out[..., self.m_secret:], self.COVER_TEMPLATES, covers)
+
+        return out.reshape(self.n, height, width * self.m)
+
+    def _fill_secret_block(self, s, out, rng):
+        """
+        Bloque secreto de todos los píxeles: una permutación aleatoria de las columnas
+        base por píxel (en lotes de filas) y un único 'gather' sobre las máscaras.
+        """
+        height, width = s.shape
+        n_cols = self.basis.shape[1]
+        identity = np.arange(n_cols, dtype=np.intp)
+        rows_per_batch = max(1, PERMUTATION_BATCH // (width * n_cols))
+
+        for y0 in range(0, height, rows_per_batch):
+            band = s[y0:y0 + rows_per_batch]
+            perms = rng.subbanda(y0, band.shape[0]).permutaciones(identity, (width,)).reshape(-1, n_cols)
+            masks = self.basis[band.reshape(-1, 1).astype(np.intp), perms]
+            masks = masks.reshape(band.shape + (self.m_secret, 3))
+            for u in range(self.n):
+                bits = (masks >> u) & 1
+                # Bit 1 -> canal bloqueado (0), bit 0 -> canal abierto (255)
+                out[u, y0:y0 + band.shape[0]] = BLANCO - ((bits[..., 0] << 2) | (bits[..., 1] << 1) | bits[..., 2])
+
+    def _process_images_pixel(self, secret_path, cover_paths, rng, umbral):
+        self._build_column_lists()
+        self._random = rng.random_python()
         try:
-            secret_img = Image.open(secret_path).convert('1')
-            covers = [Image.open(p).convert('1') for p in cover_paths]
+            secret_img, covers = cargar_entradas_1bit(secret_path, cover_paths, umbral)
         except FileNotFoundError: 
             print("Error: No se encuentran las imágenes (secret.png o covers).")
             return []
         
         width, height = secret_img.size
-        covers = [c.resize((width, height)) for c in covers]
         shadows = [Image.new('RGB', (width * self.m, height)) for _ in range(self.n)]
         
         s_pixels = secret_img.load()
@@ -129,18 +326,8 @@ class CBWEVCS_Universal_Kn_HighQuality:
         return shadows
 
     def simulate_stacking(self, shadows_to_stack):
-        w, h = shadows_to_stack[0].size
-        stacked = Image.new('RGB', (w, h))
-        data_list = [s.load() for s in shadows_to_stack]
-        ds = stacked.load()
-        for y in range(h):
-            for x in range(w):
-                cur_r, cur_g, cur_b = 255, 255, 255
-                for data in data_list:
-                    r, g, b = data[x, y]
-                    cur_r &= r; cur_g &= g; cur_b &= b
-                ds[x, y] = (cur_r, cur_g, cur_b)
-        return stacked
+        # Física de filtros: AND canal a canal de todas las sombras
+        return apilar(shadows_to_stack)
 
 if __name__ == "__main__":
 
@@ -153,6 +340,9 @@ if __name__ == "__main__":
     
     try:
         processor = CBWEVCS_Universal_Kn_HighQuality(k=K_REQUIRED, n=N_PARTICIPANTS, d=COVER_REPETITION)
+        print(f" -> Matriz Base ({processor.basis_mode}): {processor.raw_cols} columnas.")
+        print(f" -> m_secret: {processor.m_secret} px | m_cover: {processor.m_cover_total} px")
+        print(f" -> ANCHO TOTAL: x{processor.m} (Expansión)")
         shadows = processor.process_images(secret_file, cover_files)
         
         if shadows:
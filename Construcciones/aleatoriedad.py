@@ -0,0 +1,143 @@
+import os
+import random
+import numpy as np
+
+# ==========================================
+# FUENTE DE ALEATORIEDAD COMÚN
+# ==========================================
+# Todas las construcciones piden sus sorteos a una FuenteAleatoria en lugar de
+# usar el módulo global 'random'. Modos disponibles:
+#
+#  - 'contador': Philox con clave derivada de la semilla y contador = (fila, nº de
+#    sorteo de esa fila). Cada fila tiene su propio flujo, así que cualquier fila
+#    o banda se puede regenerar por separado y el resultado no depende de cómo se
+#    reparta la imagen en bandas o procesos. Es el modo por defecto.
+#  - 'rapido': un único generador SFC64 por banda, sin bucle por filas. El más
+#    rápido; reproducible con semilla, pero depende del alto de banda.
+#  - 'seguro': bytes de os.urandom (CSPRNG del sistema) para secretos reales.
+#    No es reproducible.
+#
+# process_images de cada construcción recibe la fuente en 'rng' (sin ella crea
+# una nueva, con entropía del sistema). El modo vectorizado pide un generador por
+# banda (FuenteAleatoria.banda) y el modo píxel a píxel sustituye el atributo
+# _random de la construcción por random_python().
+MODOS = ('contador', 'rapido', 'seguro')
+
+
+class FuenteAleatoria:
+    def __init__(self, semilla=None, modo='contador'):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de aleatoriedad desconocido: {modo!r}. Opciones: {MODOS}")
+        self.modo = modo
+        self.semilla = semilla
+        # Sin semilla se toma entropía del sistema una sola vez, para que todas las
+        # bandas (también en otros procesos) compartan la misma clave.
+        self._entropia = np.random.SeedSequence(semilla).entropy
+        estado = np.random.SeedSequence(self._entropia).generate_state(4, dtype=np.uint32)
+        self._clave = int.from_bytes(estado.tobytes(), 'little')  # clave Philox de 128 bits
+
+    def banda(self, y0, alto):
+        """Generador para las filas [y0, y0 + alto) de la imagen."""
+        if self.modo == 'contador':
+            return _BandaContador(self._clave, y0, np.zeros(alto, dtype=np.int64))
+        if self.modo == 'seguro':
+            return _BandaBloque(_GeneradorSeguro(), alto)
+        seq = np.random.SeedSequence(self._entropia, spawn_key=(y0,))
+        return _BandaBloque(np.random.Generator(np.random.SFC64(seq)), alto)
+
+    def random_python(self):
+        """Sustituto de 'random' para el modo píxel a píxel (misma semilla, o CSPRNG en modo seguro)."""
+        if self.modo == 'seguro':
+            return random.SystemRandom()
+        return random.Random(self._entropia)
+
+
+class _Banda:
+    """
+    Interfaz común de los generadores de banda. Todos los sorteos devuelven
+    (alto, *forma_fila), o (píxeles de la máscara, *forma_fila) si se pasa una
+    máscara booleana (alto, ancho), en el mismo orden que array[mascara].
+    """
+
+    def enteros(self, maximo, forma_fila=(), mascara=None, dtype=np.uint8):
+        """Enteros uniformes en [0, maximo). 'maximo' puede ser un array que se difunde sobre forma_fila."""
+        return self._sortear(lambda g, forma: g.integers(0, maximo, size=forma, dtype=dtype), forma_fila, mascara)
+
+    def permutaciones(self, base, forma_fila=(), mascara=None):
+        """Una permutación aleatoria independiente de 'base' por cada posición: (..., *forma_fila, len(base))."""
+        base = np.asarray(base)
+        return self._sortear(lambda g, forma: g.permuted(np.broadcast_to(base, forma + base.shape), axis=-1),
+                             forma_fila, mascara)
+
+    def palabras(self, forma_fila=()):
+        """Palabras de 64 bits aleatorios (uint64)."""
+        return self._sortear(lambda g, forma: g.bit_generator.random_raw(forma), forma_fila, None)
+
+
+class _BandaBloque(_Banda):
+    """Toda la banda sale de un solo generador, en una única llamada por sorteo."""
+
+    def __init__(self, generador, alto):
+        self.generador = generador
+        self.alto = alto
+
+    def _sortear(self, sorteo, forma_fila, mascara):
+        filas = (np.count_nonzero(mascara),) if mascara is not None else (self.alto,)
+        return sorteo(self.generador, filas + tuple(forma_fila))
+
+    def subbanda(self, inicio, alto):
+        return _BandaBloque(self.generador, alto)
+
+
+class _BandaContador(_Banda):
+    """Un Philox por fila, con contador = (fila, nº de sorteo de esa fila)."""
+
+    def __init__(self, clave, y0, llamadas):
+        self.clave = clave
+        self.y0 = y0
+        self.alto = llamadas.size
+        # Sorteos hechos por cada fila; es una vista compartida con las sub-bandas
+        self.llamadas = llamadas
+
+    def _generador(self, fila):
+        contador = ((self.y0 + fila) << 192) | (int(self.llamadas[fila]) << 128)
+        self.llamadas[fila] += 1
+        return np.random.Generator(np.random.Philox(key=self.clave, counter=contador))
+
+    def _sortear(self, sorteo, forma_fila, mascara):
+        partes = []
+        for fila in range(self.alto):
+            forma = (np.count_nonzero(mascara[fila]),) if mascara is not None else ()
+            partes.append(sorteo(self._generador(fila), forma + tuple(forma_fila)))
+        return np.concatenate(partes) if mascara is not None else np.stack(partes)
+
+    def subbanda(self, inicio, alto):
+        return _BandaContador(self.clave, self.y0 + inicio, self.llamadas[inicio:inicio + alto])
+
+
+class _GeneradorSeguro:
+    """Subconjunto de la API de numpy.random.Generator alimentado por os.urandom."""
+
+    def __init__(self):
+        self.bit_generator = self
+
+    def random_raw(self, forma):
+        forma = tuple(forma)
+        return np.frombuffer(os.urandom(8 * int(np.prod(forma))), dtype=np.uint64).reshape(forma)
+
+    def integers(self, low, high, size, dtype=np.int64):
+        # Muestreo por rechazo sobre enteros de 32 bits: sin sesgo de módulo
+        high = np.broadcast_to(np.asarray(high, dtype=np.uint64), size)
+        limite = (1 << 32) - (1 << 32) % high
+        valores = np.frombuffer(os.urandom(4 * high.size), dtype=np.uint32).astype(np.uint64).reshape(size)
+        rechazados = valores >= limite
+        while rechazados.any():
+            nuevos = np.frombuffer(os.urandom(4 * int(rechazados.sum())), dtype=np.uint32)
+            valores[rechazados] = nuevos
+            rechazados = valores >= limite
+        return (low + valores % high).astype(dtype)
+
+    def permuted(self, x, axis=-1):
+        # Ordenar por claves aleatorias de 64 bits (empates con probabilidad despreciable)
+        claves = self.random_raw(np.shape(x))
+        return np.take_along_axis(np.asarray(x), np.argsort(claves, axis=axis), axis=axis)
@@ -0,0 +1,175 @@
+import itertools
+import numpy as np
+from PIL import Image
+from comun import ROJO, VERDE, AZUL, PALETA_RGB, codigos_a_imagen
+from metricas import tramo
+
+# Bit de cada canal en los códigos de color, en el orden de los planos (R, G, B)
+BITS_CANAL = (ROJO, VERDE, AZUL)
+
+
+def a_array(sombra):
+    """Devuelve la sombra como array uint8 (alto, ancho, 3). Acepta imágenes PIL o arrays."""
+    if isinstance(sombra, PlanosBits):
+        return sombra.rgb()
+    if isinstance(sombra, Image.Image):
+        if sombra.mode != 'RGB':
+            sombra = sombra.convert('RGB')
+        return np.asarray(sombra)
+    return np.asarray(sombra, dtype=np.uint8)
+
+
+def a_codigos(sombra):
+    """
+    Devuelve la sombra como array (alto, ancho) de códigos de color de 3 bits.
+    Acepta imágenes 'P' con PALETA_RGB (sin copiar los índices), otras imágenes
+    PIL, arrays RGB (alto, ancho, 3) o arrays de códigos (alto, ancho).
+    """
+    if isinstance(sombra, PlanosBits):
+        return sombra.codigos()
+    if isinstance(sombra, Image.Image):
+        paleta = sombra.getpalette() if sombra.mode == 'P' else None
+        if paleta is not None and bytes(paleta[:24]) == PALETA_RGB.tobytes():
+            return np.asarray(sombra)
+        sombra = a_array(sombra)
+    sombra = np.asarray(sombra, dtype=np.uint8)
+    if sombra.ndim == 2:
+        return sombra
+    # Canales 0/255: el bit alto de cada canal es su bit en el código
+    return ((sombra[..., 0] >> 7) << 2) | ((sombra[..., 1] >> 7) << 1) | (sombra[..., 2] >> 7)
+
+
+class PlanosBits:
+    """
+    Sombra guardada como tres planos de bits empaquetados (R, G, B).
+
+    Cada fila de cada plano son palabras uint64, así que superponer sombras es un
+    AND de 64 subpíxeles a la vez y cada sombra ocupa 3 bits por subpíxel (frente
+    a 24 en RGB). Solo se pasa a códigos o a RGB cuando se pide una vista previa.
+    """
+
+    def __init__(self, planos, ancho):
+        self.planos = planos  # (3, alto, palabras) uint64
+        self.ancho = ancho
+
+    @classmethod
+    def desde(cls, sombra):
+        """Empaqueta una sombra (cualquier formato aceptado por a_codigos)."""
+        if isinstance(sombra, PlanosBits):
+            return sombra
+        with tramo("empaquetado"):
+            codigos = a_codigos(sombra)
+            alto, ancho = codigos.shape
+            bytes_fila = -(-ancho // 8)
+            planos = np.zeros((3, alto, -(-ancho // 64) * 8), dtype=np.uint8)
+            for c, bit in enumerate(BITS_CANAL):
+                planos[c, :, :bytes_fila] = np.packbits(codigos & bit, axis=1)
+        return cls(planos.view(np.uint64), ancho)
+
+    @property
+    def forma(self):
+        return self.planos.shape[1], self.ancho
+
+    def apilar(self, otra, exacto=False):
+        """Superpone otra sombra sobre esta, sin modificar ninguna de las dos."""
+        otra = PlanosBits.desde(otra)
+        if otra.forma != self.forma:
+            raise ValueError(f"No se pueden apilar sombras de tamaños distintos: {self.forma} y {otra.forma}.")
+        with tramo("apilado"):
+            if not exacto:
+                return PlanosBits(self.planos & otra.planos, self.ancho)
+            # Regla exacta: cualquier canal distinto (XOR) apaga los tres canales del subpíxel
+            distintos = np.bitwise_or.reduce(self.planos ^ otra.planos, axis=0)
+            return PlanosBits(self.planos & ~distintos, self.ancho)
+
+    def codigos(self):
+        """Vista previa como array (alto, ancho) de códigos de color."""
+        with tramo("vista_previa"):
+            bits = np.unpackbits(self.planos.view(np.uint8), axis=2, count=self.ancho)
+            return (bits[0] << 2) | (bits[1] << 1) | bits[2]
+
+    def rgb(self):
+        """Vista previa como array RGB (alto, ancho, 3)."""
+        return PALETA_RGB[self.codigos()]
+
+    def imagen(self):
+        """Vista previa como imagen de paleta lista para guardar o mostrar."""
+        return codigos_a_imagen(self.codigos())
+
+
+def apilar_planos(sombras, exacto=False):
+    """
+    Superpone cualquier número de sombras y devuelve el resultado como PlanosBits.
+
+    - exacto=False: física de filtros, AND canal a canal (cada transparencia
+      solo deja pasar los canales que dejan pasar todas).
+    - exacto=True: regla de las Construcciones 1-5, colores distintos bloquean
+      toda la luz. El píxel conserva su color solo si es idéntico en todas.
+    """
+    resultado = PlanosBits.desde(sombras[0])
+    for sombra in sombras[1:]:
+        # En modo exacto el parcial ya es NEGRO donde había diferencias, así que basta comparar con él
+        resultado = resultado.apilar(sombra, exacto)
+    return resultado
+
+
+def apilar_arrays(sombras, exacto=False):
+    """Igual que apilar_planos, pero devuelve un array RGB uint8 (alto, ancho, 3)."""
+    return apilar_planos(sombras, exacto).rgb()
+
+
+def apilar(sombras, exacto=False):
+    """
+    Igual que apilar_planos, pero devuelve una imagen lista para guardar o mostrar.
+    Acepta cualquier número de sombras y las superpone todas a la vez; el
+    simulate_stacking de cada construcción la llama con todas las que recibe.
+    """
+    return apilar_planos(sombras, exacto).imagen()
+
+
+def iterar_subconjuntos(sombras, subconjuntos, exacto=False):
+    """
+    Apila varios subconjuntos de sombras reutilizando los productos parciales.
+
+    'subconjuntos' puede ser un entero k >= 1 (todos los subconjuntos de tamaño k,
+    p. ej. 2 = todos los pares) o una lista explícita de tuplas de índices.
+    Los subconjuntos se recorren ordenados como un árbol de prefijos: el apilado de
+    (0, 1, 2) parte del de (0, 1), y solo se guarda en memoria la rama actual.
+
+    Genera tuplas (subconjunto, PlanosBits), con cada subconjunto tal como lo pasó
+    el llamador (p. ej. (2, 0)), en el orden lexicográfico de sus índices ordenados.
+    Usa .imagen() o .rgb() del resultado para obtener la vista previa.
+    """
+    planos = [PlanosBits.desde(s) for s in sombras]
+    if isinstance(subconjuntos, int):
+        if subconjuntos < 1:
+            raise ValueError(f"El tamaño de los subconjuntos debe ser al menos 1, no {subconjuntos}.")
+        subconjuntos = itertools.combinations(range(len(planos)), subconjuntos)
+
+    # Tupla ordenada (la que se apila) -> tuplas originales que la piden, sin repetir
+    originales = {}
+    for sub in subconjuntos:
+        sub = tuple(sub)
+        if not sub:
+            raise ValueError("Un subconjunto de sombras no puede estar vacío.")
+        originales.setdefault(tuple(sorted(sub)), {})[sub] = None
+
+    # rama[i] = (índice de sombra, apilado del prefijo hasta ese índice)
+    rama = []
+    for ordenado in sorted(originales):
+        comun = 0
+        while comun < min(len(rama), len(ordenado)) and rama[comun][0] == ordenado[comun]:
+            comun += 1
+        del rama[comun:]
+
+        for idx in ordenado[comun:]:
+            parcial = planos[idx] if not rama else rama[-1][1].apilar(planos[idx], exacto)
+            rama.append((idx, parcial))
+
+        for sub in originales[ordenado]:
+            yield sub, rama[-1][1]
+
+
+def apilar_subconjuntos(sombras, subconjuntos, exacto=False):
+    """Como iterar_subconjuntos, pero devuelve un diccionario {subconjunto: imagen}."""
+    return {sub: res.imagen() for sub, res in iterar_subconjuntos(sombras, subconjuntos, exacto)}
@@ -0,0 +1,207 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+from comun import PALETA_RGB, UMBRAL, cargar_binaria
+from escritura_png import EscritorPNG
+from lectura_png import LectorPNG
+from aleatoriedad import FuenteAleatoria
+from metricas import tramo
+
+# Filas del secreto procesadas por banda (la memoria pico depende de este valor)
+ALTO_BANDA = 64
+
+
+def _generar_banda(processor, s, covers, rng):
+    """Trabajo de un proceso: una banda con su propio generador."""
+    return processor.generate_band(s, covers, rng)
+
+
+def generar_sombras(processor, s, covers, workers=1, alto_banda=ALTO_BANDA, fuente=None, progreso=None):
+    """
+    Genera todas las sombras de una construcción como códigos de color (n, alto, ancho*m).
+
+    La imagen se divide en bandas de 'alto_banda' filas; con workers > 1 las
+    bandas se reparten en un pool de procesos. Cada banda recibe el generador de
+    sus filas de la FuenteAleatoria 'fuente' y el resultado se cose en orden. En
+    modo 'contador' la salida no depende ni del número de procesos ni del alto de banda.
+
+    'progreso', si se indica, se llama tras cada banda como progreso(filas_hechas,
+    filas_totales). Si lanza una excepción la generación se interrumpe (así se
+    cancela un trabajo) y se descartan las bandas pendientes. process_images de
+    cada construcción lo recibe en su argumento 'progreso' (solo en modo vectorizado).
+    """
+    fuente = fuente or FuenteAleatoria()
+    height, width = s.shape
+    starts = list(range(0, height, alto_banda))
+    out = np.empty((processor.n, height, width * processor.m), dtype=np.uint8)
+
+    def coser(y0, band):
+        for i, codes in enumerate(band):
+            out[i, y0:y0 + codes.shape[0]] = codes
+        if progreso is not None:
+            progreso(min(y0 + alto_banda, height), height)
+
+    if workers <= 1:
+        for y0 in starts:
+            y1 = min(y0 + alto_banda, height)
+            with tramo("sombras"):
+                band = processor.generate_band(s[y0:y1], [c[y0:y1] for c in covers], fuente.banda(y0, y1 - y0))
+            coser(y0, band)
+        return out
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_generar_banda, processor, s[y0:y0 + alto_banda], [c[y0:y0 + alto_banda] for c in covers],
+                        fuente.banda(y0, min(alto_banda, height - y0)))
+            for y0 in starts
+        ]
+        try:
+            for y0, future in zip(starts, futures):
+                with tramo("sombras"):
+                    band = future.result()
+                coser(y0, band)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return out
+
+
+@contextmanager
+def sin_limite_pixeles():
+    """
+    Desactiva mientras dura el límite Image.MAX_IMAGE_PIXELS de PIL (protección
+    contra "bombas de descompresión"), para abrir entradas propias de cualquier tamaño.
+    Es un ajuste global de PIL: solo para los scripts de línea de comandos, no para la app.
+    """
+    limite = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = limite
+
+
+def _mapa_vecino(origen, destino):
+    """Índice de origen de cada posición de destino al redimensionar por vecino más próximo (el mismo de PIL)."""
+    indices = Image.fromarray(np.arange(origen, dtype=np.int32).reshape(1, origen))
+    return np.asarray(indices.resize((destino, 1), Image.NEAREST))[0]
+
+
+class EntradaPorBandas:
+    """
+    Secreto o cubierta que se lee por bandas de filas como array booleano, con el
+    mismo resultado que comun.cargar_binaria (umbral y redimensión a 'tamano').
+
+    Los PNG se decodifican fila a fila (lectura_png.LectorPNG): solo se guardan
+    las filas de la banda actual. El resto de entradas (otros formatos, PNG
+    entrelazados o de 16 bits, imágenes PIL, arrays o umbral=None) se cargan
+    enteras con cargar_binaria, sin el límite de tamaño de PIL.
+    Las bandas se piden en orden, de arriba abajo.
+    """
+
+    def __init__(self, fuente, tamano=None, umbral=UMBRAL):
+        self.umbral = umbral
+        self._lector = None
+        if umbral is not None and isinstance(fuente, (str, os.PathLike)):
+            try:
+                self._lector = LectorPNG(fuente)
+            except ValueError:
+                pass
+
+        if self._lector is None:
+            with sin_limite_pixeles():
+                self._binaria = cargar_binaria(fuente, tamano, umbral)
+            self.tamano = self._binaria.shape[1], self._binaria.shape[0]
+            return
+
+        origen = self._lector.ancho, self._lector.alto
+        self.tamano = tuple(tamano) if tamano is not None else origen
+        self._filas = _mapa_vecino(origen[1], self.tamano[1])
+        self._columnas = _mapa_vecino(origen[0], self.tamano[0]) if self.tamano[0] != origen[0] else None
+        # Filas de origen ya leídas que aún puede pedir alguna banda, desde la fila self._inicio
+        self._inicio = 0
+        self._leidas = np.empty((0, origen[0]), dtype=bool)
+
+    def _leer(self, filas):
+        return self._lector.leer_filas(filas) >= self.umbral
+
+    def leer(self, y0, y1):
+        """Filas [y0, y1) como array booleano (y1 - y0, ancho)."""
+        if self._lector is None:
+            return self._binaria[y0:y1]
+
+        filas = self._filas[y0:y1]
+        primera, ultima = int(filas[0]), int(filas[-1]) + 1
+        fin = self._inicio + len(self._leidas)
+        if primera < self._inicio:
+            raise ValueError(f"Las bandas se leen en orden: la fila {y0} ya se descartó.")
+        if primera >= fin:
+            # Filas de origen que ninguna banda usa (al reducir): se decodifican y se tiran
+            for y in range(fin, primera, ALTO_BANDA):
+                self._lector.leer_filas(min(ALTO_BANDA, primera - y))
+            self._leidas, fin = self._leidas[:0], primera
+        else:
+            self._leidas = self._leidas[primera - self._inicio:]
+        self._inicio = primera
+        if ultima > fin:
+            self._leidas = np.concatenate([self._leidas, self._leer(ultima - fin)])
+
+        banda = self._leidas[filas - primera]
+        return banda if self._columnas is None else banda[:, self._columnas]
+
+    def cerrar(self):
+        if self._lector is not None:
+            self._lector.cerrar()
+
+
+def generar_por_bandas(processor, secret_path, cover_paths, output_paths, alto_banda=ALTO_BANDA, fuente=None,
+                       umbral=UMBRAL):
+    """
+    Modo streaming: genera las sombras de cualquier construcción por bandas
+    horizontales y escribe cada banda directamente en su PNG de salida.
+
+    Con entradas PNG de hasta 8 bits sin entrelazar, cada banda del secreto y de
+    las cubiertas se decodifica justo antes de usarla (ver EntradaPorBandas): la
+    memoria pico es de unas pocas bandas de alto_banda x ancho, no depende del
+    alto de la imagen y no hay límite de píxeles. Otras entradas se decodifican
+    completas (la imagen PIL más un byte por píxel del array booleano).
+    Los PNG se escriben con paleta (los códigos de color tal cual, 4 bits por subpíxel).
+    'umbral' es el de binarización de las entradas (ver comun.cargar_binaria).
+    Devuelve la lista de rutas escritas (vacía si hay error en los parámetros).
+    """
+    if len(cover_paths) != processor.n or len(output_paths) != processor.n:
+        print(f"Error: Se requieren {processor.n} cubiertas y {processor.n} rutas de salida.")
+        return []
+
+    entradas = [EntradaPorBandas(secret_path, umbral=umbral)]
+    writers = []
+    try:
+        width, height = entradas[0].tamano
+        entradas += [EntradaPorBandas(c, (width, height), umbral) for c in cover_paths]
+
+        print(f"Generando {processor.n} sombras por bandas de {alto_banda} filas...")
+
+        fuente = fuente or FuenteAleatoria()
+        for p in output_paths:
+            writers.append(EscritorPNG(p, width * processor.m, height, paleta=PALETA_RGB))
+        for y0 in range(0, height, alto_banda):
+            y1 = min(y0 + alto_banda, height)
+            s, *covers = [e.leer(y0, y1) for e in entradas]
+            with tramo("sombras"):
+                band = processor.generate_band(s, covers, fuente.banda(y0, y1 - y0))
+            for writer, codes in zip(writers, band):
+                writer.escribir_filas(codes)
+        for writer in writers:
+            writer.cerrar()
+    except BaseException:
+        # Si algo falla (también al cerrar) se cierran y se borran todas las sombras: no quedan PNG a medias
+        for writer in writers:
+            writer.descartar()
+        raise
+    finally:
+        for entrada in entradas:
+            entrada.cerrar()
+    return list(output_paths)
@@ -0,0 +1,258 @@
+from functools import lru_cache
+from math import comb
+
+# ==========================================
+# MATRICES BASE DE MENOR EXPANSIÓN (CONSTRUCCIÓN 6)
+# ==========================================
+# La base clásica de la Construcción 6 toma, para cada subconjunto de k
+# usuarios, todas las columnas de paridad par (blanco) o impar (negro):
+# 2^(k-1) * C(n, k) columnas. Aquí se buscan bases simétricas más pequeñas
+# que cumplen las mismas condiciones:
+#   - Seguridad: cualquier grupo de k-1 usuarios ve las mismas columnas
+#     (como multiconjunto) con secreto blanco y con secreto negro.
+#   - Contraste: cualquier grupo de k o más usuarios tiene más columnas
+#     transparentes (todas a 0) con secreto blanco que con secreto negro.
+#
+# Una base simétrica se describe con un peso d_t por cada peso de Hamming t:
+# d_t > 0 -> la base blanca lleva d_t veces cada máscara de t usuarios negros,
+# d_t < 0 -> la base negra lleva |d_t| veces cada una. La seguridad son k
+# ecuaciones lineales en d (triangulares: d_0..d_{k-1} quedan determinados por
+# el resto) y el contraste una inecuación por tamaño de grupo q >= k, así que
+# basta una búsqueda entera sobre d_k..d_n.
+
+BASE_MINIMA = "minima"
+BASE_CLASICA = "clasica"
+MODOS_BASE = (BASE_MINIMA, BASE_CLASICA)
+
+# Nodos máximos de la búsqueda para (k, n) fuera de la tabla; si se agotan se
+# usa la mejor base encontrada hasta entonces (o la clásica si no hay ninguna)
+LIMITE_NODOS = 20_000
+
+# Pesos mínimos precalculados (d_0, ..., d_n) para 2 <= k <= n <= 12.
+# Se regeneran con: python bases.py (y se comprueban con: python bases.py --comprobar)
+TABLA_PESOS = {
+    (2, 2): (1, -1, 1),  # 2 columnas (clásica: 2)
+    (2, 3): (2, -1, 0, 1),  # 3 columnas (clásica: 6)
+    (3, 3): (1, -1, 1, -1),  # 4 columnas (clásica: 4)
+    (2, 4): (3, -1, 0, 0, 1),  # 4 columnas (clásica: 12)
+    (3, 4): (2, -1, 0, 1, -2),  # 6 columnas (clásica: 16)
+    (4, 4): (1, -1, 1, -1, 1),  # 8 columnas (clásica: 8)
+    (2, 5): (4, -1, 0, 0, 0, 1),  # 5 columnas (clásica: 20)
+    (3, 5): (3, -1, 0, 0, 1, -3),  # 8 columnas (clásica: 40)
+    (4, 5): (3, -2, 1, 0, -1, 2),  # 15 columnas (clásica: 40)
+    (5, 5): (1, -1, 1, -1, 1, -1),  # 16 columnas (clásica: 16)
+    (2, 6): (5, -1, 0, 0, 0, 0, 1),  # 6 columnas (clásica: 30)
+    (3, 6): (4, -1, 0, 0, 0, 1, -4),  # 10 columnas (clásica: 80)
+    (4, 6): (6, -3, 1, 0, 0, -1, 3),  # 24 columnas (clásica: 120)
+    (5, 6): (3, -2, 1, 0, -1, 2, -3),  # 30 columnas (clásica: 96)
+    (6, 6): (1, -1, 1, -1, 1, -1, 1),  # 32 columnas (clásica: 32)
+    (2, 7): (6, -1, 0, 0, 0, 0, 0, 1),  # 7 columnas (clásica: 42)
+    (3, 7): (5, -1, 0, 0, 0, 0, 1, -5),  # 12 columnas (clásica: 140)
+    (4, 7): (10, -4, 1, 0, 0, 0, -1, 4),  # 35 columnas (clásica: 280)
+    (5, 7): (6, -3, 1, 0, 0, -1, 3, -6),  # 48 columnas (clásica: 336)
+    (6, 7): (4, -3, 2, -1, 0, 1, -2, 3),  # 70 columnas (clásica: 224)
+    (7, 7): (1, -1, 1, -1, 1, -1, 1, -1),  # 64 columnas (clásica: 64)
+    (2, 8): (7, -1, 0, 0, 0, 0, 0, 0, 1),  # 8 columnas (clásica: 56)
+    (3, 8): (6, -1, 0, 0, 0, 0, 0, 1, -6),  # 14 columnas (clásica: 224)
+    (4, 8): (15, -5, 1, 0, 0, 0, 0, -1, 5),  # 48 columnas (clásica: 560)
+    (5, 8): (10, -4, 1, 0, 0, 0, -1, 4, -10),  # 70 columnas (clásica: 896)
+    (6, 8): (9, -5, 2, 0, -1, 1, 0, -2, 5),  # 126 columnas (clásica: 896)
+    (7, 8): (4, -3, 2, -1, 0, 1, -2, 3, -4),  # 140 columnas (clásica: 512)
+    (8, 8): (1, -1, 1, -1, 1, -1, 1, -1, 1),  # 128 columnas (clásica: 128)
+    (2, 9): (8, -1, 0, 0, 0, 0, 0, 0, 0, 1),  # 9 columnas (clásica: 72)
+    (3, 9): (7, -1, 0, 0, 0, 0, 0, 0, 1, -7),  # 16 columnas (clásica: 336)
+    (4, 9): (21, -6, 1, 0, 0, 0, 0, 0, -1, 6),  # 63 columnas (clásica: 1008)
+    (5, 9): (15, -5, 1, 0, 0, 0, 0, -1, 5, -15),  # 96 columnas (clásica: 2016)
+    (6, 9): (20, -10, 4, -1, 0, 0, 0, 1, -4, 10),  # 210 columnas (clásica: 2688)
+    (7, 9): (9, -5, 2, 0, -1, 1, 0, -2, 5, -9),  # 252 columnas (clásica: 2304)
+    (8, 9): (5, -4, 3, -2, 1, 0, -1, 2, -3, 4),  # 315 columnas (clásica: 1152)
+    (9, 9): (1, -1, 1, -1, 1, -1, 1, -1, 1, -1),  # 256 columnas (clásica: 256)
+    (2, 10): (9, -1, 0, 0, 0, 0, 0, 0, 0, 0, 1),  # 10 columnas (clásica: 90)
+    (3, 10): (8, -1, 0, 0, 0, 0, 0, 0, 0, 1, -8),  # 18 columnas (clásica: 480)
+    (4, 10): (28, -7, 1, 0, 0, 0, 0, 0, 0, -1, 7),  # 80 columnas (clásica: 1680)
+    (5, 10): (21, -6, 1, 0, 0, 0, 0, 0, -1, 6, -21),  # 126 columnas (clásica: 4032)
+    (6, 10): (35, -15, 5, -1, 0, 0, 0, 0, 1, -5, 15),  # 320 columnas (clásica: 6720)
+    (7, 10): (20, -10, 4, -1, 0, 0, 0, 1, -4, 10, -20),  # 420 columnas (clásica: 7680)
+    (8, 10): (14, -9, 5, -2, 0, 1, -1, 0, 2, -5, 9),  # 590 columnas (clásica: 5760)
+    (9, 10): (5, -4, 3, -2, 1, 0, -1, 2, -3, 4, -5),  # 630 columnas (clásica: 2560)
+    (10, 10): (1, -1, 1, -1, 1, -1, 1, -1, 1, -1, 1),  # 512 columnas (clásica: 512)
+    (2, 11): (10, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1),  # 11 columnas (clásica: 110)
+    (3, 11): (9, -1, 0, 0, 0, 0, 0, 0, 0, 0, 1, -9),  # 20 columnas (clásica: 660)
+    (4, 11): (36, -8, 1, 0, 0, 0, 0, 0, 0, 0, -1, 8),  # 99 columnas (clásica: 2640)
+    (5, 11): (28, -7, 1, 0, 0, 0, 0, 0, 0, -1, 7, -28),  # 160 columnas (clásica: 7392)
+    (6, 11): (56, -21, 6, -1, 0, 0, 0, 0, 0, 1, -6, 21),  # 462 columnas (clásica: 14784)
+    (7, 11): (35, -15, 5, -1, 0, 0, 0, 0, 1, -5, 15, -35),  # 640 columnas (clásica: 21120)
+    (8, 11): (15, -6, 1, 1, -1, 0, 1, -1, -1, 6, -15, 29),  # 1056 columnas (clásica: 21120)
+    (9, 11): (14, -9, 5, -2, 0, 1, -1, 0, 2, -5, 9, -14),  # 1180 columnas (clásica: 14080)
+    (10, 11): (6, -5, 4, -3, 2, -1, 0, 1, -2, 3, -4, 5),  # 1386 columnas (clásica: 5632)
+    (11, 11): (1, -1, 1, -1, 1, -1, 1, -1, 1, -1, 1, -1),  # 1024 columnas (clásica: 1024)
+    (2, 12): (11, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1),  # 12 columnas (clásica: 132)
+    (3, 12): (10, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, -10),  # 22 columnas (clásica: 880)
+    (4, 12): (45, -9, 1, 0, 0, 0, 0, 0, 0, 0, 0, -1, 9),  # 120 columnas (clásica: 3960)
+    (5, 12): (36, -8, 1, 0, 0, 0, 0, 0, 0, 0, -1, 8, -36),  # 198 columnas (clásica: 12672)
+    (6, 12): (84, -28, 7, -1, 0, 0, 0, 0, 0, 0, 1, -7, 28),  # 640 columnas (clásica: 29568)
+    (7, 12): (56, -21, 6, -1, 0, 0, 0, 0, 0, 1, -6, 21, -56),  # 924 columnas (clásica: 50688)
+    (8, 12): (50, -21, 6, 0, -1, 0, 1, -1, 0, 1, 0, -6, 21),  # 1611 columnas (clásica: 63360)
+    (9, 12): (29, -15, 6, -1, -1, 1, 0, -1, 1, 1, -6, 15, -29),  # 2112 columnas (clásica: 56320)
+    (10, 12): (20, -14, 9, -5, 2, 0, -1, 1, 0, -2, 5, -9, 14),  # 2740 columnas (clásica: 33792)
+    (11, 12): (6, -5, 4, -3, 2, -1, 0, 1, -2, 3, -4, 5, -6),  # 2772 columnas (clásica: 12288)
+    (12, 12): (1, -1, 1, -1, 1, -1, 1, -1, 1, -1, 1, -1, 1),  # 2048 columnas (clásica: 2048)
+}
+
+
+def _c(a, b):
+    return comb(a, b) if 0 <= b <= a else 0
+
+
+def pesos_clasicos(k, n):
+    """Pesos d_t de la base clásica: cada máscara de t <= k usuarios, C(n-t, k-t) veces."""
+    return tuple((-1) ** t * _c(n - t, k - t) for t in range(n + 1))
+
+
+def columnas(pesos, n):
+    """Columnas de cada una de las dos bases (blanca y negra) descritas por 'pesos'."""
+    return sum(abs(d) * comb(n, t) for t, d in enumerate(pesos)) // 2
+
+
+def buscar_pesos(k, n, limite_nodos=None):
+    """
+    Pesos simétricos de menos columnas para (k, n), o None si la búsqueda agota
+    'limite_nodos' sin encontrar ninguno. Sin límite el resultado es el óptimo
+    entre las bases simétricas.
+
+    Se prueba con una cota de columnas B = 1, 2, 4... hasta encontrar solución;
+    en cada cota se recorren d_k..d_{n-1} de mayor a menor C(n, t) (los que más
+    columnas cuestan primero) y d_n, el más barato, se resuelve directamente.
+    """
+    r = n - k + 1
+    coste = [comb(n, t) for t in range(n + 1)]
+
+    def completar(d):
+        # Seguridad: para j < k, sum_t d_t C(n-k+1, t-j) = 0, resuelto de j = k-1 a 0
+        for j in range(k - 1, -1, -1):
+            d[j] = -sum(d[t] * _c(r, t - j) for t in range(j + 1, n + 1))
+        return d
+
+    # Los pesos son lineales en d_n: d = base + x * v
+    v = completar([0] * n + [1])
+    contraste = [[_c(n - q, t) for t in range(n + 1)] for q in range(k, n + 1)]
+    contraste_v = [sum(a * b for a, b in zip(fila, v)) for fila in contraste]
+    orden = sorted(range(k, n), key=lambda t: -coste[t])
+    mejor = [None, None]
+    nodos = [0]
+
+    def hoja(d, cota):
+        base = completar(d[:])
+        base[n] = 0
+        # Contraste: a + b*x >= 1 para cada tamaño de grupo -> intervalo de x
+        lo, hi = None, None
+        for fila, b in zip(contraste, contraste_v):
+            a = sum(x * y for x, y in zip(fila, base))
+            if b == 0:
+                if a < 1:
+                    return
+            elif b > 0:
+                lo = max(lo, -((a - 1) // b)) if lo is not None else -((a - 1) // b)
+            else:
+                hi = min(hi, (a - 1) // -b) if hi is not None else (a - 1) // -b
+        if lo is not None and hi is not None and lo > hi:
+            return
+        # El coste es convexo a trozos en x: basta probar los extremos y los cambios de signo
+        candidatos = {c for c in (lo, hi) if c is not None}
+        for t in range(n + 1):
+            if v[t]:
+                x0 = -base[t] // v[t]
+                candidatos.update((x0 - 1, x0, x0 + 1))
+        for x in candidatos:
+            if (lo is None or x >= lo) and (hi is None or x <= hi):
+                pesos = [b + x * vt for b, vt in zip(base, v)]
+                total = columnas(pesos, n)
+                if total <= cota and (mejor[0] is None or total < mejor[0]):
+                    mejor[0], mejor[1] = total, tuple(pesos)
+
+    def explorar(i, d, parcial, cota):
+        nodos[0] += 1
+        if limite_nodos is not None and nodos[0] > limite_nodos:
+            raise TimeoutError
+        if mejor[0] is not None:
+            cota = min(cota, mejor[0] - 1)
+        if i == len(orden):
+            hoja(d, cota)
+            return
+        t = orden[i]
+        limite = (2 * cota - parcial) // coste[t]
+        for valor in sorted(range(-limite, limite + 1), key=abs):
+            d[t] = valor
+            explorar(i + 1, d, parcial + abs(valor) * coste[t], cota)
+        d[t] = 0
+
+    cota = 1
+    try:
+        while mejor[1] is None:
+            explorar(0, [0] * (n + 1), 0, cota)
+            cota *= 2
+    except TimeoutError:
+        pass
+    return mejor[1]
+
+
+@lru_cache(maxsize=None)
+def pesos_base(k, n, modo=BASE_MINIMA):
+    """
+    Pesos de la base que se usará para (k, n): la clásica, o en modo 'minima' la
+    de menos columnas conocida (tabla, búsqueda acotada o la clásica si es menor).
+    """
+    if modo not in MODOS_BASE:
+        raise ValueError(f"Modo de base desconocido: {modo} (opciones: {', '.join(MODOS_BASE)}).")
+    clasicos = pesos_clasicos(k, n)
+    if modo == BASE_CLASICA:
+        return clasicos
+    pesos = TABLA_PESOS.get((k, n)) or buscar_pesos(k, n, LIMITE_NODOS)
+    if pesos is None or columnas(pesos, n) >= columnas(clasicos, n):
+        return clasicos
+    return pesos
+
+
+def columnas_base(k, n, modo=BASE_MINIMA):
+    """Columnas de la base (sin el relleno hasta múltiplo de 3) para (k, n)."""
+    return columnas(pesos_base(k, n, modo), n)
+
+
+def _regenerar_tabla():
+    """Imprime TABLA_PESOS (búsqueda sin límite; los n más altos tardan minutos)."""
+    print("TABLA_PESOS = {")
+    for n in range(2, 13):
+        for k in range(2, n + 1):
+            pesos = buscar_pesos(k, n)
+            print(f"    ({k}, {n}): {pesos},  # {columnas(pesos, n)} columnas "
+                  f"(clásica: {columnas(pesos_clasicos(k, n), n)})", flush=True)
+    print("}")
+
+
+def _comprobar_tabla():
+    """Comprueba por fuerza bruta la seguridad y el contraste de cada base de TABLA_PESOS."""
+    # NumPy solo hace falta aquí: el registro importa este módulo sin cargarlo
+    from Construccion6_v2 import build_symmetric_basis, check_basis
+
+    errores = 0
+    for (k, n), pesos in TABLA_PESOS.items():
+        fallos = check_basis(build_symmetric_basis(n, pesos), k, n)
+        if columnas(pesos, n) > columnas(pesos_clasicos(k, n), n):
+            fallos.append("más columnas que la clásica")
+        if fallos:
+            errores += 1
+            print(f"({k}, {n}): {len(fallos)} fallos, p. ej. {fallos[0]}")
+    print(f"{len(TABLA_PESOS)} bases comprobadas, {errores} con errores.")
+    return errores == 0
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Tabla de bases mínimas de la Construcción 6.")
+    parser.add_argument("--comprobar", action="store_true",
+                        help="Comprobar la tabla actual por fuerza bruta en lugar de regenerarla.")
+    if parser.parse_args().comprobar:
+        sys.exit(0 if _comprobar_tabla() else 1)
+    _regenerar_tabla()
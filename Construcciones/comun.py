@@ -0,0 +1,145 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from metricas import tramo
+
+# ==========================================
+# CÓDIGOS DE COLOR (3 bits: R=4, G=2, B=1)
+# ==========================================
+# Todos los colores que usan las construcciones son esquinas del cubo RGB.
+# Codificándolos con un bit por canal, superponer dos filtros (física de la
+# luz) equivale a un AND bit a bit entre códigos.
+NEGRO, AZUL, VERDE, CIAN, ROJO, MAGENTA, AMARILLO, BLANCO = range(8)
+
+PALETA_RGB = np.array([
+    (0, 0, 0),        # NEGRO
+    (0, 0, 255),      # AZUL
+    (0, 255, 0),      # VERDE
+    (0, 255, 255),    # CIAN
+    (255, 0, 0),      # ROJO
+    (255, 0, 255),    # MAGENTA
+    (255, 255, 0),    # AMARILLO
+    (255, 255, 255),  # BLANCO
+], dtype=np.uint8)
+
+# Nivel de gris (0-255) a partir del cual un píxel de entrada se considera blanco
+UMBRAL = 128
+
+
+def plantillas_cubierta(n, columnas_base, repeticiones=1):
+    """
+    Bloque de cubierta precalculado de cada usuario, array (n, 2, columnas_base * repeticiones):
+    [i, 0] = cubierta negra (todo NEGRO) y [i, 1] = cubierta blanca (su color R/G/B en la
+    columna de su grupo de 3, NEGRO en el resto). El bloque base se repite 'repeticiones' veces.
+    """
+    plantillas = np.full((n, 2, columnas_base), NEGRO, dtype=np.uint8)
+    usuarios = np.arange(n)
+    plantillas[usuarios, 1, usuarios // 3] = np.array([ROJO, VERDE, AZUL], dtype=np.uint8)[usuarios % 3]
+    return np.tile(plantillas, repeticiones)
+
+
+def rellenar_cubiertas(bloque, plantillas, covers):
+    """
+    Rellena el bloque de cubierta (n, filas, ancho, columnas) de todas las sombras:
+    cada píxel copia entera la plantilla de su usuario según el bit de su cubierta.
+    """
+    for i, cover in enumerate(covers):
+        # astype y no view: los arrays bool que da PIL pueden guardar True como 255
+        bloque[i] = np.take(plantillas[i], cover.astype(np.uint8), axis=0)
+
+
+def abrir_imagen(fuente):
+    """
+    Devuelve una imagen PIL a partir de una ruta (o fichero abierto), una imagen
+    PIL o un array NumPy. Así las construcciones pueden trabajar en memoria sin
+    pasar por disco.
+    """
+    if isinstance(fuente, Image.Image):
+        return fuente
+    if isinstance(fuente, np.ndarray):
+        return Image.fromarray(fuente)
+    return Image.open(fuente)
+
+
+def cargar_binaria(fuente, tamano=None, umbral=UMBRAL):
+    """
+    Abre una imagen (ruta, imagen PIL o array), la binariza y la devuelve
+    como array booleano (alto, ancho).
+    True = Blanco (Transparente), False = Negro (Tinta/Info).
+
+    umbral: nivel de gris a partir del cual un píxel es blanco. Con None se usa
+    el difuminado Floyd-Steinberg de convert('1'), como en el código original.
+    Si se indica 'tamano' (ancho, alto) se redimensiona por vecino más próximo;
+    si ya coincide no se toca. Un array booleano del tamaño pedido se devuelve tal cual.
+    """
+    if isinstance(fuente, np.ndarray) and fuente.dtype == bool:
+        if tamano is None or fuente.shape == (tamano[1], tamano[0]):
+            return fuente
+    with tramo("carga"):
+        img = abrir_imagen(fuente)
+        if umbral is None:
+            img = img.convert('1')
+        img.load()
+    if tamano is not None and img.size != tuple(tamano):
+        with tramo("redimension"):
+            img = img.resize(tamano, Image.NEAREST)
+    with tramo("umbral"):
+        gris = img if img.mode == 'L' else img.convert('L')
+        return np.asarray(gris) >= (umbral if umbral is not None else 128)
+
+
+def cargar_entradas(secreto, cubiertas, umbral=UMBRAL, hilos=None):
+    """
+    Etapa de entrada común a todas las construcciones: devuelve el secreto y las
+    cubiertas como arrays booleanos, con las cubiertas al tamaño del secreto.
+    Las imágenes se decodifican en paralelo en 'hilos' hilos (por defecto uno
+    por imagen, hasta el número de CPUs); PIL libera el GIL al decodificar.
+    Los arrays no se empaquetan en bits (un byte por píxel): las construcciones
+    los indexan píxel a píxel y se pasan por bandas a generate_band.
+    """
+    if isinstance(secreto, np.ndarray):
+        alto, ancho = secreto.shape[:2]
+    else:
+        secreto = abrir_imagen(secreto)  # solo lee la cabecera
+        ancho, alto = secreto.size
+    tareas = [(secreto, None)] + [(c, (ancho, alto)) for c in cubiertas]
+
+    hilos = hilos or min(len(tareas), os.cpu_count() or 1)
+    if hilos <= 1:
+        arrays = [cargar_binaria(f, t, umbral) for f, t in tareas]
+    else:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            # copy_context: los tramos de cada hilo se suman a la medición activa
+            futuros = [pool.submit(contextvars.copy_context().run, cargar_binaria, f, t, umbral) for f, t in tareas]
+            arrays = [f.result() for f in futuros]
+    return arrays[0], arrays[1:]
+
+
+def cargar_entradas_1bit(secreto, cubiertas, umbral=UMBRAL):
+    """
+    Como cargar_entradas, pero como imágenes PIL '1' (0 = negro, 255 = blanco)
+    para el modo píxel a píxel, que así binariza igual que el vectorizado.
+    Con umbral=None equivale al convert('1') + resize del código original.
+    """
+    s, covers = cargar_entradas(secreto, cubiertas, umbral)
+    return Image.fromarray(s), [Image.fromarray(c) for c in covers]
+
+
+def codigos_a_imagen(codigos, rgb=False):
+    """
+    Convierte un array (alto, ancho) de códigos de color en una imagen.
+
+    Por defecto devuelve una imagen en modo 'P' (1 byte por subpíxel, con
+    PALETA_RGB como paleta), que PIL guarda como PNG de paleta de 4 bits.
+    Con rgb=True devuelve la imagen RGB (3 bytes por subpíxel).
+    """
+    with tramo("imagen_salida"):
+        img = Image.fromarray(codigos.astype(np.uint8, copy=False), 'P')
+        img.putpalette(PALETA_RGB.tobytes())
+        if rgb:
+            # La conversión P -> RGB de PIL es bastante más rápida que indexar PALETA_RGB en NumPy
+            return img.convert('RGB')
+        return img
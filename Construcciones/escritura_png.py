@@ -0,0 +1,95 @@
+import os
+import struct
+import zlib
+import numpy as np
+from metricas import tramo
+
+
+class EscritorPNG:
+    """
+    Escribe un PNG por bandas de filas.
+    Cada banda se comprime y se vuelca al fichero en cuanto llega, así que
+    nunca hace falta tener la imagen completa en memoria.
+
+    - Sin 'paleta': PNG RGB de 8 bits, las bandas son arrays (filas, ancho, 3).
+    - Con 'paleta' (array (colores, 3), p. ej. PALETA_RGB): PNG de paleta con la
+      menor profundidad que admita (1, 2, 4 u 8 bits por píxel). Las bandas son
+      arrays (filas, ancho) de índices, así que las sombras se escriben
+      directamente como códigos de color: con 8 colores son 4 bits por subpíxel.
+
+    Por defecto usa compresión rápida (nivel 1): las sombras son ruido de color
+    y los niveles altos apenas reducen el tamaño pero son varias veces más lentos.
+    """
+
+    def __init__(self, ruta, ancho, alto, nivel_compresion=1, paleta=None):
+        self.ruta = ruta
+        self.ancho = ancho
+        self.alto = alto
+        self.filas_escritas = 0
+        self._compresor = zlib.compressobj(nivel_compresion)
+
+        if paleta is None:
+            self.bits, tipo_color = 8, 2  # RGB
+        else:
+            paleta = np.asarray(paleta, dtype=np.uint8)
+            if not 1 <= len(paleta) <= 256:
+                raise ValueError(f"Una paleta PNG admite de 1 a 256 colores, no {len(paleta)}.")
+            self.bits = next(b for b in (1, 2, 4, 8) if len(paleta) <= 1 << b)
+            tipo_color = 3  # Paleta
+        self.paleta = paleta
+
+        self._f = open(ruta, 'wb')
+        self._f.write(b'\x89PNG\r\n\x1a\n')
+        # IHDR: ancho, alto, bits, tipo de color, compresión, filtro, sin entrelazado
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', ancho, alto, self.bits, tipo_color, 0, 0, 0))
+        if paleta is not None:
+            self._chunk(b'PLTE', paleta.tobytes())
+
+    def _chunk(self, tipo, datos):
+        self._f.write(struct.pack('>I', len(datos)))
+        self._f.write(tipo)
+        self._f.write(datos)
+        self._f.write(struct.pack('>I', zlib.crc32(tipo + datos) & 0xFFFFFFFF))
+
+    def escribir_filas(self, banda):
+        """Añade una banda al final de la imagen: (filas, ancho, 3) en RGB o (filas, ancho) de índices con paleta."""
+        filas = banda.shape[0]
+        forma = (self.ancho, 3) if self.paleta is None else (self.ancho,)
+        if banda.shape[1:] != forma or self.filas_escritas + filas > self.alto:
+            raise ValueError(f"Banda de tamaño {banda.shape} incompatible con un PNG de {self.ancho}x{self.alto}.")
+
+        with tramo("codificacion_png"):
+            if self.paleta is None:
+                datos_filas = banda.reshape(filas, -1)
+            elif self.bits == 8:
+                datos_filas = banda
+            else:
+                # Índices de menos de 8 bits: varios por byte, el primero en los bits altos
+                por_byte = 8 // self.bits
+                relleno = -self.ancho % por_byte
+                grupos = np.pad(banda.astype(np.uint8, copy=False), ((0, 0), (0, relleno))).reshape(filas, -1, por_byte)
+                desplazamientos = (np.arange(por_byte - 1, -1, -1) * self.bits).astype(np.uint8)
+                datos_filas = np.bitwise_or.reduce(grupos << desplazamientos, axis=2)
+
+            # Cada fila del PNG empieza con el byte de filtro (0 = sin filtro)
+            crudo = np.zeros((filas, 1 + datos_filas.shape[1]), dtype=np.uint8)
+            crudo[:, 1:] = datos_filas
+            datos = self._compresor.compress(crudo.tobytes())
+            if datos:
+                self._chunk(b'IDAT', datos)
+        self.filas_escritas += filas
+
+    def cerrar(self):
+        """Cierra el PNG. Falla si no se escribieron todas las filas."""
+        if self.filas_escritas != self.alto:
+            self.descartar()
+            raise ValueError(f"{self.ruta}: se escribieron {self.filas_escritas} de {self.alto} filas.")
+        self._chunk(b'IDAT', self._compresor.flush())
+        self._chunk(b'IEND', b'')
+        self._f.close()
+
+    def descartar(self):
+        """Cierra y borra un PNG a medio escribir (p. ej. tras un error)."""
+        self._f.close()
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
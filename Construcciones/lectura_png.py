@@ -0,0 +1,157 @@
+import io
+import struct
+import zlib
+import numpy as np
+from PIL import Image
+from metricas import tramo
+
+FIRMA_PNG = b'\x89PNG\r\n\x1a\n'
+# Canales de cada tipo de color PNG: gris, RGB, paleta, gris + alfa, RGBA
+CANALES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# Tipo de color de 8 bits con los mismos bytes por píxel (así PIL deshace los filtros sin convertir nada)
+_TIPO_POR_BYTES = {1: 0, 2: 4, 3: 2, 4: 6}
+# Píxeles por trozo que se entrega a PIL (muy por debajo de Image.MAX_IMAGE_PIXELS)
+PIXELES_TROZO = 1 << 22
+
+
+def luminancia(rgb):
+    """Gris (0-255) de un array (..., 3) con la misma fórmula entera que convert('L') de PIL."""
+    rgb = rgb.astype(np.uint32)
+    return ((rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16).astype(np.uint8)
+
+
+def _chunk(tipo, datos):
+    return struct.pack('>I', len(datos)) + tipo + datos + struct.pack('>I', zlib.crc32(tipo + datos) & 0xFFFFFFFF)
+
+
+class LectorPNG:
+    """
+    Lee un PNG por bandas de filas, en niveles de gris como convert('L').
+    La secuencia IDAT se descomprime a medida que se piden filas, así que nunca
+    hace falta tener la imagen completa en memoria (ni pasa por el límite
+    MAX_IMAGE_PIXELS de PIL, que se aplica al abrir la imagen entera).
+
+    Para deshacer los filtros de cada trozo se le da a PIL un PNG pequeño con esas
+    filas, precedidas de la última fila ya decodificada. Admite PNG sin entrelazar
+    de 1, 2, 4 u 8 bits (gris, RGB, paleta, gris + alfa y RGBA); con cualquier
+    otra entrada lanza ValueError.
+    """
+
+    def __init__(self, ruta):
+        self._f = open(ruta, 'rb')
+        try:
+            self._leer_cabecera()
+        except BaseException:
+            self._f.close()
+            raise
+        self._zlib = zlib.decompressobj()
+        self._anterior = None  # Última fila ya sin filtros (bytes)
+        self.filas_leidas = 0
+
+    def _leer_chunk(self):
+        cabecera = self._f.read(8)
+        if len(cabecera) < 8:
+            raise ValueError(f"{self._f.name}: PNG truncado.")
+        longitud, tipo = struct.unpack('>I4s', cabecera)
+        datos = self._f.read(longitud)
+        self._f.read(4)  # CRC
+        return tipo, datos
+
+    def _leer_cabecera(self):
+        if self._f.read(8) != FIRMA_PNG:
+            raise ValueError(f"{self._f.name} no es un PNG.")
+        tipo, datos = self._leer_chunk()
+        if tipo != b'IHDR':
+            raise ValueError(f"{self._f.name}: falta la cabecera IHDR.")
+        self.ancho, self.alto, self.bits, self.tipo_color, _, _, entrelazado = struct.unpack('>IIBBBBB', datos)
+        if entrelazado or self.tipo_color not in CANALES or self.bits > 8 or (self.bits < 8 and self.tipo_color not in (0, 3)):
+            raise ValueError(f"{self._f.name}: formato PNG no admitido por bandas "
+                             f"({self.bits} bits, tipo de color {self.tipo_color}, entrelazado={entrelazado}).")
+
+        self._paleta = None
+        while tipo != b'IDAT':
+            tipo, datos = self._leer_chunk()
+            if tipo == b'PLTE':
+                paleta = np.zeros((256, 3), dtype=np.uint8)
+                colores = np.frombuffer(datos, dtype=np.uint8).reshape(-1, 3)
+                paleta[:len(colores)] = colores
+                self._paleta = luminancia(paleta)
+            elif tipo == b'IEND':
+                raise ValueError(f"{self._f.name}: PNG sin datos de imagen.")
+        if self.tipo_color == 3 and self._paleta is None:
+            raise ValueError(f"{self._f.name}: PNG de paleta sin PLTE.")
+        self._idat = datos
+
+        canales = CANALES[self.tipo_color]
+        self._bytes_pixel = max(1, canales * self.bits // 8)
+        self._bytes_fila = -(-self.ancho * canales * self.bits // 8)
+        self._pendiente = b''
+
+    def _siguiente_idat(self):
+        """Datos del siguiente chunk IDAT, o None si ya no quedan."""
+        if self._idat is not None:
+            datos, self._idat = self._idat, None
+            return datos
+        tipo, datos = self._leer_chunk()
+        return datos if tipo == b'IDAT' else None
+
+    def _descomprimir(self, n):
+        """Siguientes n bytes de la secuencia de filas filtradas."""
+        partes, total = [self._pendiente], len(self._pendiente)
+        while total < n:
+            entrada = self._zlib.unconsumed_tail or self._siguiente_idat()
+            if entrada is None:
+                raise ValueError(f"{self._f.name}: PNG truncado.")
+            datos = self._zlib.decompress(entrada, n - total)
+            partes.append(datos)
+            total += len(datos)
+        datos = b''.join(partes)
+        self._pendiente = datos[n:]
+        return datos[:n]
+
+    def _sin_filtros(self, filas):
+        """Bytes sin filtros de las siguientes 'filas' filas, array (filas, bytes por fila)."""
+        datos = self._descomprimir(filas * (1 + self._bytes_fila))
+        if self._anterior is not None:
+            # La fila anterior sin filtro (tipo 0), para los filtros que miran la fila de arriba
+            datos = b'\x00' + self._anterior + datos
+        filas_png = filas + (self._anterior is not None)
+        png = (FIRMA_PNG
+               + _chunk(b'IHDR', struct.pack('>IIBBBBB', self._bytes_fila // self._bytes_pixel, filas_png, 8,
+                                             _TIPO_POR_BYTES[self._bytes_pixel], 0, 0, 0))
+               + _chunk(b'IDAT', zlib.compress(datos, 0))
+               + _chunk(b'IEND', b''))
+        crudo = np.asarray(Image.open(io.BytesIO(png))).reshape(filas_png, self._bytes_fila)[filas_png - filas:]
+        self._anterior = crudo[-1].tobytes()
+        return crudo
+
+    def _a_gris(self, crudo):
+        if self.bits < 8:
+            # Varios píxeles por byte, el primero en los bits altos
+            desplazamientos = np.arange(8 - self.bits, -1, -self.bits, dtype=np.uint8)
+            valores = ((crudo[:, :, None] >> desplazamientos) & ((1 << self.bits) - 1)).reshape(len(crudo), -1)
+            valores = valores[:, :self.ancho]
+        else:
+            valores = crudo.reshape(len(crudo), self.ancho, -1)
+        if self.tipo_color == 3:
+            return self._paleta[valores[..., 0] if valores.ndim == 3 else valores]
+        if self.tipo_color == 0:
+            return valores[..., 0] if valores.ndim == 3 else valores * np.uint8(255 // ((1 << self.bits) - 1))
+        if self.tipo_color == 4:
+            return valores[..., 0]
+        return luminancia(valores[..., :3])  # RGB y RGBA: el alfa se ignora, como en convert('L')
+
+    def leer_filas(self, filas):
+        """Siguientes 'filas' filas en niveles de gris, array uint8 (filas, ancho)."""
+        filas = min(filas, self.alto - self.filas_leidas)
+        trozo = max(1, PIXELES_TROZO // max(1, self._bytes_fila))
+        gris = np.empty((filas, self.ancho), dtype=np.uint8)
+        with tramo("carga"):
+            for y in range(0, filas, trozo):
+                n = min(trozo, filas - y)
+                gris[y:y + n] = self._a_gris(self._sin_filtros(n))
+        self.filas_leidas += filas
+        return gris
+
+    def cerrar(self):
+        self._f.close()
@@ -0,0 +1,78 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ==========================================
+# INSTRUMENTACIÓN (TRAMOS DE TIEMPO)
+# ==========================================
+# El código de las construcciones marca sus fases con 'with tramo("nombre"):'.
+# Si no hay ninguna medición activa no se hace nada más que una consulta a la
+# ContextVar, así que los tramos pueden quedarse en el código de producción.
+#
+#     with medir() as m:
+#         processor.process_images(...)
+#     print(m.como_dict())
+#
+# La medición activa es propia de cada hilo (ContextVar), de modo que varias
+# generaciones simultáneas no se mezclan; los hilos auxiliares que la deban
+# compartir se lanzan con contextvars.copy_context().run. Los tramos ejecutados en otros
+# procesos (generar_sombras con workers > 1) no se registran por separado.
+
+_activa = ContextVar("metricas_activa", default=None)
+
+
+class Metricas:
+    """
+    Acumula el tiempo de cada tramo: segundos totales y número de llamadas.
+    Los tramos anidados se cuentan en los dos (tiempo inclusivo).
+    Si se indica 'emitir', se llama con un evento (dict) al cerrar cada tramo.
+    """
+
+    def __init__(self, emitir=None):
+        self.emitir = emitir
+        self.tramos = {}
+        self.inicio = time.perf_counter()
+        self.total = None
+        # La carga de entradas registra tramos desde varios hilos a la vez
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre, segundos):
+        with self._lock:
+            acumulado = self.tramos.setdefault(nombre, {"segundos": 0.0, "llamadas": 0})
+            acumulado["segundos"] += segundos
+            acumulado["llamadas"] += 1
+        if self.emitir is not None:
+            self.emitir({"tramo": nombre, "segundos": segundos, "t": time.perf_counter() - self.inicio})
+
+    def como_dict(self):
+        """{'total': segundos, 'tramos': {nombre: {'segundos', 'llamadas'}}}, tramos de mayor a menor."""
+        total = self.total if self.total is not None else time.perf_counter() - self.inicio
+        orden = sorted(self.tramos.items(), key=lambda t: -t[1]["segundos"])
+        return {"total": total, "tramos": {nombre: dict(datos) for nombre, datos in orden}}
+
+
+@contextmanager
+def medir(emitir=None):
+    """Activa una medición nueva para el código ejecutado dentro del bloque."""
+    metricas = Metricas(emitir)
+    token = _activa.set(metricas)
+    try:
+        yield metricas
+    finally:
+        metricas.total = time.perf_counter() - metricas.inicio
+        _activa.reset(token)
+
+
+@contextmanager
+def tramo(nombre):
+    """Mide el bloque como el tramo 'nombre' de la medición activa (si la hay)."""
+    metricas = _activa.get()
+    if metricas is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas.registrar(nombre, time.perf_counter() - inicio)
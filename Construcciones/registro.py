@@ -0,0 +1,125 @@
+import importlib
+import math
+from bases import TABLA_PESOS, columnas_base
+
+# ==========================================
+# REGISTRO DE CONSTRUCCIONES
+# ==========================================
+# Metadatos de las seis construcciones (k/n admitidos, expansión m, colores de
+# las sombras) sin importar su código: la app pinta la barra lateral y valida
+# los parámetros sin cargar NumPy ni calcular matrices base. El módulo de cada
+# construcción se importa la primera vez que se instancia.
+#
+#     construccion = CONSTRUCCIONES[6]
+#     construccion.expansion(3, 5, d=3)       # m, sin instanciar nada
+#     processor = construccion.crear(3, 5, d=3)
+
+# Participantes máximos de las construcciones (2, n): todas las sombras se
+# generan (y en la app se guardan) en memoria a la vez
+N_MAX_2_DE_N = 64
+# Construcción 6: hasta donde llega la tabla de bases mínimas. Más allá habría
+# que buscar la base (segundos) solo para mostrar m, y la expansión se dispara
+N_MAX_C6 = max(n for _, n in TABLA_PESOS)
+
+
+def _expansion_c4(k, n, d):
+    # Teorema 2: m1 = ceil(log3 n) columnas de secreto + m2 = ceil(n/3) de cubierta
+    return (math.ceil(math.log(n, 3)) if n > 1 else 1) + math.ceil(n / 3)
+
+
+def _expansion_c6(k, n, d):
+    # Columnas de la matriz base mínima (de la tabla, con n <= N_MAX_C6), rellenadas
+    # hasta múltiplo de 3 (un subpíxel RGB cada 3)
+    raw_cols = columnas_base(k, n)
+    return (raw_cols + (3 - raw_cols % 3) % 3) // 3 + math.ceil(n / 3) * d
+
+
+class Construccion:
+    """
+    Descripción de una construcción. 'k_fijo' / 'n_fijo' indican los parámetros
+    que no se pueden elegir y 'n_max' el mayor n admitido (k <= n, así que también
+    acota k); 'dos_cubiertas' que process_images recibe las dos
+    cubiertas por separado (C1-C3) y 'exacto' la regla de apilamiento de
+    simulate_stacking (ver apilamiento.apilar).
+    """
+
+    def __init__(self, numero, nombre, modulo, clase, expansion, colores,
+                 k_fijo=None, n_fijo=None, n_max=None, dos_cubiertas=False, exacto=True):
+        self.numero = numero
+        self.nombre = nombre
+        self.modulo = modulo
+        self.clase = clase
+        self._expansion = expansion
+        self.colores = colores
+        self.k_fijo = k_fijo
+        self.n_fijo = n_fijo
+        self.n_max = n_max if n_max is not None else n_fijo
+        self.dos_cubiertas = dos_cubiertas
+        self.exacto = exacto
+
+    @property
+    def usa_d(self):
+        """Solo la construcción (k, n) general admite repeticiones de cubierta d."""
+        return self.k_fijo is None
+
+    def validar(self, k, n):
+        """Lanza ValueError si la construcción no admite (k, n)."""
+        if self.n_fijo is not None:
+            if (k, n) != (self.k_fijo, self.n_fijo):
+                raise ValueError(f"La Construcción {self.numero} es ({self.k_fijo}, {self.n_fijo}); "
+                                 f"se pidió ({k}, {n}).")
+        elif self.k_fijo is not None:
+            if k != self.k_fijo or not 2 <= n <= self.n_max:
+                raise ValueError(f"La Construcción {self.numero} es ({self.k_fijo}, n) con 2 <= n <= {self.n_max}; "
+                                 f"se pidió ({k}, {n}).")
+        elif not 2 <= k <= n <= self.n_max:
+            raise ValueError(f"La Construcción {self.numero} necesita 2 <= k <= n <= {self.n_max}; "
+                             f"se pidió ({k}, {n}).")
+
+    def expansion(self, k, n, d=1):
+        """Subpíxeles por píxel del secreto (m) para (k, n, d), sin instanciar la construcción."""
+        self.validar(k, n)
+        return self._expansion(k, n, d)
+
+    def cargar_clase(self):
+        """Importa el módulo de la construcción (solo la primera vez) y devuelve su clase."""
+        return getattr(importlib.import_module(self.modulo), self.clase)
+
+    def crear(self, k, n, d=1):
+        """Instancia la construcción validando (k, n) antes de importar nada."""
+        self.validar(k, n)
+        clase = self.cargar_clase()
+        if self.n_fijo is not None:
+            return clase()
+        if self.k_fijo is not None:
+            return clase(n_participants=n)
+        return clase(k=k, n=n, d=d)
+
+
+CONSTRUCCIONES = {c.numero: c for c in [
+    Construccion(1, "Construcción 1 (estricta)", "Construccion1", "CBWEVCS_Strict",
+                 lambda k, n, d: 2, ("NEGRO", "ROJO", "VERDE", "AZUL"),
+                 k_fijo=2, n_fijo=2, dos_cubiertas=True),
+    Construccion(2, "Construcción 2 (RGB + CMY)", "Construccion2", "CBWEVCS_Construction2",
+                 lambda k, n, d: 2, ("NEGRO", "ROJO", "VERDE", "AZUL", "CIAN", "MAGENTA", "AMARILLO"),
+                 k_fijo=2, n_fijo=2, dos_cubiertas=True),
+    Construccion(3, "Construcción 3 (cian / rojo)", "Construccion3", "CBWEVCS_Construction3",
+                 lambda k, n, d: 2, ("NEGRO", "CIAN", "ROJO"),
+                 k_fijo=2, n_fijo=2, dos_cubiertas=True),
+    Construccion(4, "Construcción 4 (segura, 2 de n)", "Construccion4", "CBWEVCS_Construction4_Secure",
+                 _expansion_c4, ("NEGRO", "ROJO", "VERDE", "AZUL"), k_fijo=2, n_max=N_MAX_2_DE_N),
+    Construccion(5, "Construcción 5 (negro perfecto, 2 de n)", "Construccion5", "CBWEVCS_Construction5_PB",
+                 lambda k, n, d: 2 * math.ceil(n / 3), ("NEGRO", "ROJO", "VERDE", "AZUL"), k_fijo=2,
+                 n_max=N_MAX_2_DE_N),
+    Construccion(6, "Construcción 6 (universal k de n)", "Construccion6_v2", "CBWEVCS_Universal_Kn_HighQuality",
+                 _expansion_c6, ("NEGRO", "AZUL", "VERDE", "CIAN", "ROJO", "MAGENTA", "AMARILLO", "BLANCO"),
+                 n_max=N_MAX_C6, exacto=False),
+]}
+
+
+def obtener(numero):
+    """Construcción por número (1-6); ValueError si no existe."""
+    try:
+        return CONSTRUCCIONES[int(numero)]
+    except (KeyError, ValueError):
+        raise ValueError(f"Construcción desconocida: {numero} (opciones: 1-{len(CONSTRUCCIONES)}).") from None
@@ -0,0 +1,51 @@
+import threading
+from functools import lru_cache
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from metricas import tramo
+
+# Fuentes que se prueban en orden: Arial (Windows) y DejaVuSans (Linux/Streamlit Cloud)
+FUENTES = ("arial.ttf", "DejaVuSans.ttf")
+# Lienzo (ancho, alto) de las imágenes de texto de la app
+LIENZO = (600, 400)
+
+# FreeType no garantiza que una misma fuente se pueda usar desde varios hilos a la vez
+_lock_dibujo = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def cargar_fuente(tamano):
+    """Primera fuente disponible de FUENTES en el tamaño pedido; se carga una sola vez por proceso."""
+    for nombre in FUENTES:
+        try:
+            return ImageFont.truetype(nombre, tamano)
+        except IOError:
+            continue
+    # Último recurso (se verá pequeño, pero no hay otra opción sin subir archivo)
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=256)
+def texto_binario(texto, tamano, lienzo=LIENZO):
+    """
+    Texto negro centrado sobre un lienzo blanco, como array booleano (alto, ancho)
+    listo para las construcciones (True = Blanco). Se memoriza por (texto, tamaño,
+    lienzo), así que el array es de solo lectura: es el mismo en cada llamada.
+    """
+    with tramo("texto"), _lock_dibujo:
+        img = Image.new('1', lienzo, color=1)
+        draw = ImageDraw.Draw(img)
+        font = cargar_fuente(tamano)
+
+        # Centrado compatible
+        try:
+            left, top, right, bottom = draw.textbbox((0, 0), texto, font=font)
+            w, h = right - left, bottom - top
+        except AttributeError:
+            w, h = draw.textsize(texto, font=font)
+
+        draw.text(((lienzo[0] - w) / 2, (lienzo[1] - h) / 2), texto, font=font, fill=0)
+        # Vía 'L': el array bool que da PIL de una imagen '1' puede guardar True como 255
+        binaria = np.asarray(img.convert('L')) >= 128
+    binaria.setflags(write=False)
+    return binaria
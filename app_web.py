@@ -1,8 +1,12 @@
 import streamlit as st
-from PIL import Image, ImageDraw, ImageFont
 import os
 import sys
-import glob
+import io
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Criptografía Visual - CBW-EVCS", layout="wide")
@@ -11,75 +15,252 @@ st.set_page_config(page_title="Criptografía Visual - CBW-EVCS", layout="wide")
 # Añadimos la carpeta Construcciones al path
 sys.path.append(os.path.join(os.path.dirname(__file__), "Construcciones"))
 
+# Solo el registro (metadatos) y las métricas: NumPy y el código de cada
+# construcción se importan al lanzar la primera generación, no al pintar la página.
 try:
-    from Construccion1 import CBWEVCS_Strict
-    from Construccion2 import CBWEVCS_Construction2
-    from Construccion3 import CBWEVCS_Construction3
-    from Construccion4 import CBWEVCS_Construction4_Secure
-    from Construccion5 import CBWEVCS_Construction5_PB
-    from Construccion6_v2 import CBWEVCS_Universal_Kn_HighQuality
+    from registro import CONSTRUCCIONES
+    from metricas import medir, tramo
 except ImportError as e:
     st.error(f"Error importando construcciones: {e}")
 
+# Repeticiones de cubierta de la Construcción 6 en la app
+D_C6 = 3
+# Memoria máxima de la caché de resultados (PNG comprimidos), compartida por todas las sesiones
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Generaciones que se ejecutan a la vez y peticiones que pueden esperar turno (todas las sesiones)
+MAX_TRABAJOS_SIMULTANEOS = 2
+MAX_TRABAJOS_EN_COLA = 8
+
+# --- CACHÉ DE RESULTADOS ---
+
+class CacheResultados:
+    """
+    Caché LRU de resultados con límite de tamaño en bytes.
+    Cada entrada es un diccionario {nombre de fichero: bytes PNG}. Al superar el
+    límite se descartan las entradas usadas hace más tiempo.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()  # Streamlit atiende cada sesión en su propio hilo
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._entradas:
+                return None
+            self._entradas.move_to_end(clave)
+            return self._entradas[clave]
+
+    def guardar(self, clave, ficheros):
+        tamano = sum(len(datos) for datos in ficheros.values())
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self.bytes -= sum(len(d) for d in self._entradas.pop(clave).values())
+            self._entradas[clave] = ficheros
+            self.bytes += tamano
+            while self.bytes > self.max_bytes:
+                _, viejos = self._entradas.popitem(last=False)
+                self.bytes -= sum(len(d) for d in viejos.values())
+
+
+@st.cache_resource
+def obtener_cache():
+    return CacheResultados(CACHE_MAX_BYTES)
+
+# --- COLA DE TRABAJOS ---
+
+class ColaTrabajos:
+    """
+    Cola acotada de generaciones, compartida por todas las sesiones.
+    Como mucho 'max_simultaneos' trabajos se ejecutan a la vez en un pool de
+    hilos y otros 'max_en_cola' esperan turno; con la cola llena se rechazan los
+    nuevos en lugar de acumular trabajo en el servidor. Cada trabajo devuelve
+    sus propios resultados, así que las sesiones nunca comparten salida.
+    """
+
+    def __init__(self, max_simultaneos, max_en_cola):
+        self.max_pendientes = max_simultaneos + max_en_cola
+        self.pendientes = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix="cbwevcs")
+        self._lock = threading.Lock()
+
+    def enviar(self, funcion, *args):
+        """Encola funcion(*args). Devuelve un Future, o None si la cola está llena."""
+        with self._lock:
+            if self.pendientes >= self.max_pendientes:
+                return None
+            self.pendientes += 1
+        futuro = self._pool.submit(funcion, *args)
+        futuro.add_done_callback(self._terminado)
+        return futuro
+
+    def _terminado(self, futuro):
+        with self._lock:
+            self.pendientes -= 1
+
+
+@st.cache_resource
+def obtener_cola():
+    return ColaTrabajos(MAX_TRABAJOS_SIMULTANEOS, MAX_TRABAJOS_EN_COLA)
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro de un trabajo cuando el usuario lo cancela."""
+
+
+class Trabajo:
+    """
+    Estado de una generación en segundo plano.
+    El hilo de la cola informa de la fase y de las filas generadas; la interfaz
+    lo consulta periódicamente sin bloquear la sesión y puede cancelarlo.
+    """
+
+    def __init__(self, construction_type=None, cache_key=None):
+        self.construction_type = construction_type
+        self.cache_key = cache_key
+        self.futuro = None
+        self.fase = "En cola"
+        self.filas_hechas = 0
+        self.filas_totales = 0
+        self.inicio = None
+        self.metricas = None
+        self._cancelado = threading.Event()
+
+    def cambiar_fase(self, fase):
+        if self._cancelado.is_set():
+            raise TrabajoCancelado()
+        if self.inicio is None:
+            self.inicio = time.time()
+        self.fase = fase
+
+    def informar(self, filas_hechas, filas_totales):
+        """Callback de progreso de process_images: interrumpe la generación si se ha cancelado."""
+        if self._cancelado.is_set():
+            raise TrabajoCancelado()
+        self.filas_hechas = filas_hechas
+        self.filas_totales = filas_totales
+
+    def cancelar(self):
+        self._cancelado.set()
+        if self.futuro is not None:
+            self.futuro.cancel()  # Si aún espera en la cola, no llega a ejecutarse
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def fraccion(self):
+        return self.filas_hechas / self.filas_totales if self.filas_totales else 0.0
+
+    def tiempos(self):
+        """(segundos transcurridos, segundos restantes estimados o None)."""
+        if self.inicio is None:
+            return 0.0, None
+        transcurrido = time.time() - self.inicio
+        fraccion = self.fraccion()
+        if not 0 < fraccion < 1:
+            return transcurrido, None
+        return transcurrido, transcurrido * (1 - fraccion) / fraccion
+
 # --- FUNCIONES AUXILIARES (Reutilizadas) ---
 
-def limpiar_archivos_previos(selection):
-    folder = "ImagenesCreadas"
-    if not os.path.exists(folder):
-        return
-    
-    # Borrar cubiertas
-    for f in glob.glob(os.path.join(folder, "cover*.png")):
-        try: os.remove(f)
-        except: pass
-
-    # Borrar resultados específicos
-    prefix = f"C{selection}_"
-    files_to_remove = [f for f in os.listdir(folder) if f.startswith(prefix) and f.endswith(".png")]
-    for filename in files_to_remove:
-        try: os.remove(os.path.join(folder, filename))
-        except: pass
+def encode_png(img):
+    """Codifica una imagen PIL como PNG en memoria."""
+    with tramo("codificacion_png"):
+        buffer = io.BytesIO()
+        # Nivel 1: las sombras son ruido de color y los niveles altos apenas reducen el tamaño
+        img.save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
 
 def generate_source_images(n, secret_text, cover_text):
-    output_dir = "ImagenesCreadas"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    def create_img(text, filename, is_secret=False):
-        img = Image.new('1', (600, 400), color=1) 
-        draw = ImageDraw.Draw(img)
-        try:
-            # 1. Intentar Arial (Windows standard)
-            font = ImageFont.truetype("arial.ttf", 100 if is_secret else 80)
-        except IOError:
-            try:
-                # 2. Intentar DejaVuSans (Linux/Streamlit Cloud standard)
-                font = ImageFont.truetype("DejaVuSans.ttf", 100 if is_secret else 80)
-            except IOError:
-                # 3. Último recurso (Se verá pequeño, pero no hay otra opción sin subir archivo)
-                font = ImageFont.load_default()
-        
-        # Centrado compatible
-        try:
-            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
-            w, h = right - left, bottom - top
-        except AttributeError:
-            w, h = draw.textsize(text, font=font)
-            
-        x = (600 - w) / 2
-        y = (400 - h) / 2
-        draw.text((x, y), text, font=font, fill=0)
-        path = os.path.join(output_dir, filename)
-        img.save(path)
-        return path
-
-    path_secret = create_img(secret_text, "secret.png", is_secret=True)
-    cover_paths = []
-    for i in range(n):
-        fname = f"cover{i+1}.png"
-        create_img(f"{cover_text} {i+1}", fname)
-        cover_paths.append(os.path.join(output_dir, fname))
-    return path_secret, cover_paths
+    """
+    Secreto y n cubiertas como arrays booleanos. Cada texto se dibuja una sola vez
+    por proceso (texto.texto_binario), así que repetir o cambiar solo n es casi gratis.
+    """
+    from texto import texto_binario
+
+    secret = texto_binario(secret_text, 100)
+    covers = [texto_binario(f"{cover_text} {i+1}", 80) for i in range(n)]
+    return secret, covers
+
+def run_construction(construction_type, k_val, n_val, secret_txt, cover_txt, seed_val, modo_rng="contador",
+                     trabajo=None):
+    """
+    Genera las imágenes base, ejecuta la construcción y sus pruebas de apilamiento.
+    Devuelve {nombre de fichero: bytes PNG}. No usa Streamlit, así que puede
+    ejecutarse en un hilo de la cola de trabajos; 'trabajo' recibe el progreso
+    y, al terminar, el desglose de tiempos en trabajo.metricas.
+    Sin semilla (seed_val=None) cada ejecución toma entropía nueva del sistema.
+    """
+    from aleatoriedad import FuenteAleatoria
+    from apilamiento import iterar_subconjuntos
+
+    trabajo = trabajo or Trabajo()
+
+    with medir() as metricas:
+        # 1. Generación Base (en memoria)
+        trabajo.cambiar_fase("Generando sombras")
+        secret, covers = generate_source_images(n_val, secret_txt, cover_txt)
+
+        results = {}
+        rng = FuenteAleatoria(seed_val, modo_rng)
+        construccion = CONSTRUCCIONES[int(construction_type)]
+        processor = construccion.crear(k_val, n_val, D_C6)
+        prefix = f"C{construction_type}"
+
+        # 2. Ejecución de Construcciones (Tu lógica exacta)
+        if construccion.dos_cubiertas:
+            # C1, C2 y C3: (2, 2)
+            s1, s2 = processor.process_images(secret, covers[0], covers[1], rng=rng, progreso=trabajo.informar)
+            results[f"{prefix}_shadow1.png"] = s1
+            results[f"{prefix}_shadow2.png"] = s2
+            results[f"{prefix}_stacked.png"] = processor.simulate_stacking(s1, s2)
+
+        elif construccion.k_fijo is not None:
+            # C4 y C5: 2 de n
+            shadows = processor.process_images(secret, covers, rng=rng, progreso=trabajo.informar)
+            for i, s in enumerate(shadows):
+                results[f"{prefix}_shadow{i+1}.png"] = s
+
+            # Pares + Total en una sola pasada (comparten productos parciales)
+            outputs = {(i, j): [f"{prefix}_stacked_{i+1}y{j+1}.png"]
+                       for i, j in itertools.combinations(range(len(shadows)), 2)}
+            outputs.setdefault(tuple(range(len(shadows))), []).append(f"{prefix}_stacked_ALL.png")
+            trabajo.cambiar_fase("Apilando")
+            for subset, res in iterar_subconjuntos(shadows, outputs, exacto=True):
+                for filename in outputs[subset]:
+                    results[filename] = res.imagen()
+
+        else:
+            # C6: k de n
+            shadows = processor.process_images(secret, covers, rng=rng, progreso=trabajo.informar)
+
+            if shadows:
+                for i, s in enumerate(shadows):
+                    results[f"C6_Shadow_Final_User{i+1}.png"] = s
+
+                # k-1, k y n primeras sombras: cada prueba parte del apilado de la anterior
+                tests = {}
+                if k_val > 1:
+                    tests[tuple(range(k_val - 1))] = f"C6_Test_Security_{k_val-1}_of_{n_val}.png"
+                tests[tuple(range(k_val))] = f"C6_Test_Success_{k_val}_of_{n_val}.png"
+                if n_val > k_val:
+                    tests[tuple(range(n_val))] = f"C6_Test_ALL_{n_val}_of_{n_val}.png"
+
+                trabajo.cambiar_fase("Apilando")
+                for subset, res in iterar_subconjuntos(shadows, tests):
+                    results[tests[subset]] = res.imagen()
+
+        # Codificar una sola vez: la galería y la caché usan los mismos PNG
+        trabajo.cambiar_fase("Codificando PNG")
+        results = {filename: encode_png(img) for filename, img in results.items()}
+
+    trabajo.metricas = metricas.como_dict()
+    return results
 
 # --- INTERFAZ GRÁFICA WEB ---
 
@@ -98,23 +279,37 @@ with st.sidebar:
     st.header("2. Algoritmo")
     construction_type = st.selectbox(
         "Elige la Construcción",
-        options=["1", "2", "3", "4", "5", "6"],
-        format_func=lambda x: f"Construcción {x}"
+        options=[str(numero) for numero in CONSTRUCCIONES],
+        format_func=lambda x: CONSTRUCCIONES[int(x)].nombre
     )
-    
-    # Lógica dinámica de inputs
-    if construction_type in ["1", "2", "3"]:
-        k_val = 2
-        n_val = 2
-        st.info("🔒 Para C1, C2 y C3, k=2 y n=2 fijos.")
-    elif construction_type in ["4", "5"]:
-        k_val = 2
-        n_val = st.number_input("Participantes (n)", min_value=2, value=3)
-        st.info("🔒 Para C4 y C5, k=2 fijo.")
+    construccion = CONSTRUCCIONES[int(construction_type)]
+
+    # Lógica dinámica de inputs (según los parámetros fijos del registro)
+    if construccion.n_fijo is not None:
+        k_val = construccion.k_fijo
+        n_val = construccion.n_fijo
+        st.info(f"🔒 Para C{construction_type}, k={k_val} y n={n_val} fijos.")
+    elif construccion.k_fijo is not None:
+        k_val = construccion.k_fijo
+        n_val = st.number_input("Participantes (n)", min_value=2, max_value=construccion.n_max, value=3)
+        st.info(f"🔒 Para C{construction_type}, k={k_val} fijo.")
     else: # Construcción 6
-        k_val = st.number_input("Umbral (k)", min_value=2, value=3)
+        k_val = st.number_input("Umbral (k)", min_value=2, max_value=construccion.n_max, value=3)
         default_n = max(4, k_val)
-        n_val = st.number_input("Participantes (n)", min_value=k_val, value=default_n)
+        n_val = st.number_input("Participantes (n)", min_value=k_val, max_value=construccion.n_max, value=default_n)
+
+    st.caption(f"Expansión: m = {construccion.expansion(k_val, n_val, D_C6)} subpíxeles por píxel")
+
+    seguro = st.checkbox("Aleatoriedad criptográfica", help="Para secretos reales: usa el generador del sistema "
+                         "(os.urandom). Las sombras no se pueden reproducir y se ignora la semilla.")
+    # Sin semilla por defecto: con una semilla conocida, quien tenga una sola sombra puede
+    # regenerar los sorteos y recuperar el secreto. La semilla es solo para pruebas reproducibles.
+    seed_val = st.number_input("Semilla (opcional, solo pruebas)", min_value=0, value=None, step=1,
+                               placeholder="Aleatoria", disabled=seguro,
+                               help="Misma semilla y parámetros = mismas sombras. Vacía = sombras nuevas cada vez.")
+    if seguro:
+        seed_val = None
+    show_timings = st.checkbox("Mostrar desglose de tiempos")
 
     st.divider()
     
@@ -123,129 +318,116 @@ with st.sidebar:
 # --- LÓGICA DE EJECUCIÓN ---
 
 if btn_run:
-    output_dir = "ImagenesCreadas"
-    
-    with st.spinner('Limpiando y Procesando...'):
-        # 1. Limpieza
-        limpiar_archivos_previos(construction_type)
-        
-        # 2. Generación Base
-        secret_path, cover_paths = generate_source_images(n_val, secret_txt, cover_txt)
-        
-        processor = None
-        
-        # 3. Ejecución de Construcciones (Tu lógica exacta)
-        try:
-            if construction_type == "1":
-                processor = CBWEVCS_Strict()
-                s1, s2 = processor.process_images(secret_path, cover_paths[0], cover_paths[1])
-                s1.save(os.path.join(output_dir, "C1_shadow1.png"))
-                s2.save(os.path.join(output_dir, "C1_shadow2.png"))
-                processor.simulate_stacking(s1, s2).save(os.path.join(output_dir, "C1_stacked.png"))
-
-            elif construction_type == "2":
-                processor = CBWEVCS_Construction2()
-                s1, s2 = processor.process_images(secret_path, cover_paths[0], cover_paths[1])
-                s1.save(os.path.join(output_dir, "C2_shadow1.png"))
-                s2.save(os.path.join(output_dir, "C2_shadow2.png"))
-                processor.simulate_stacking(s1, s2).save(os.path.join(output_dir, "C2_stacked.png"))
-
-            elif construction_type == "3":
-                processor = CBWEVCS_Construction3()
-                s1, s2 = processor.process_images(secret_path, cover_paths[0], cover_paths[1])
-                s1.save(os.path.join(output_dir, "C3_shadow1.png"))
-                s2.save(os.path.join(output_dir, "C3_shadow2.png"))
-                processor.simulate_stacking(s1, s2).save(os.path.join(output_dir, "C3_stacked.png"))
-
-            elif construction_type == "4":
-                processor = CBWEVCS_Construction4_Secure(n_participants=n_val)
-                shadows = processor.process_images(secret_path, cover_paths)
-                for i, s in enumerate(shadows):
-                    s.save(os.path.join(output_dir, f"C4_shadow{i+1}.png"))
-                
-                # Pares
-                for i in range(len(shadows)):
-                    for j in range(i + 1, len(shadows)):
-                        res = processor.simulate_stacking(shadows[i], shadows[j])
-                        res.save(os.path.join(output_dir, f"C4_stacked_{i+1}y{j+1}.png"))
-                
-                # Total
-                stacked_all = shadows[0]
-                for i in range(1, len(shadows)):
-                    stacked_all = processor.simulate_stacking(stacked_all, shadows[i])
-                stacked_all.save(os.path.join(output_dir, "C4_stacked_ALL.png"))
-
-            elif construction_type == "5":
-                processor = CBWEVCS_Construction5_PB(n_participants=n_val)
-                shadows = processor.process_images(secret_path, cover_paths)
-                for i, s in enumerate(shadows):
-                    s.save(os.path.join(output_dir, f"C5_shadow{i+1}.png"))
-                
-                # Pares
-                for i in range(len(shadows)):
-                    for j in range(i + 1, len(shadows)):
-                        res = processor.simulate_stacking(shadows[i], shadows[j])
-                        res.save(os.path.join(output_dir, f"C5_stacked_{i+1}y{j+1}.png"))
-                
-                # Total
-                stacked_all = shadows[0]
-                for i in range(1, len(shadows)):
-                    stacked_all = processor.simulate_stacking(stacked_all, shadows[i])
-                stacked_all.save(os.path.join(output_dir, "C5_stacked_ALL.png"))
-
-            elif construction_type == "6":
-                processor = CBWEVCS_Universal_Kn_HighQuality(k=k_val, n=n_val, d=3)
-                shadows = processor.process_images(secret_path, cover_paths)
-                
-                if shadows:
-                    for i, s in enumerate(shadows):
-                        s.save(os.path.join(output_dir, f"C6_Shadow_Final_User{i+1}.png"))
-                    
-                    if k_val > 1:
-                        res_fail = processor.simulate_stacking(shadows[:k_val-1])
-                        res_fail.save(os.path.join(output_dir, f"C6_Test_Security_{k_val-1}_of_{n_val}.png"))
-                    
-                    res_success = processor.simulate_stacking(shadows[:k_val])
-                    res_success.save(os.path.join(output_dir, f"C6_Test_Success_{k_val}_of_{n_val}.png"))
-                    
-                    if n_val > k_val:
-                        res_all = processor.simulate_stacking(shadows)
-                        res_all.save(os.path.join(output_dir, f"C6_Test_ALL_{n_val}_of_{n_val}.png"))
-
-            st.success("¡Proceso completado!")
-            
-        except Exception as e:
-            st.error(f"Error: {e}")
+    cache = obtener_cache()
+    # Solo se cachean (y se comparten entre sesiones) las ejecuciones con semilla explícita:
+    # sin ella, cada generación debe dar sombras distintas
+    cache_key = None
+    if seed_val is not None:
+        cache_key = (construction_type, k_val, n_val, D_C6 if construccion.usa_d else None,
+                     secret_txt, cover_txt, seed_val)
+    cached = cache.obtener(cache_key) if cache_key is not None else None
+
+    if cached is not None:
+        # Mismos parámetros que una ejecución anterior: se reutilizan sus PNG sin recalcular
+        st.session_state.setdefault("resultados", {})[construction_type] = cached
+        st.session_state.setdefault("metricas", {}).pop(construction_type, None)
+        st.success("¡Proceso completado! (resultado en caché)")
+
+    elif "trabajo" in st.session_state:
+        st.warning("Ya hay una generación en curso en esta sesión. Cancélala o espera a que termine.")
+
+    else:
+        trabajo = Trabajo(construction_type, cache_key)
+        trabajo.futuro = obtener_cola().enviar(run_construction, construction_type, k_val, n_val,
+                                               secret_txt, cover_txt, seed_val,
+                                               "seguro" if seguro else "contador", trabajo)
+        if trabajo.futuro is None:
+            st.warning("⏳ El servidor está atendiendo demasiadas generaciones. Inténtalo de nuevo en unos segundos.")
+        else:
+            st.session_state["trabajo"] = trabajo
+
+# --- PROGRESO DEL TRABAJO EN SEGUNDO PLANO ---
+
+@st.fragment(run_every=0.5)
+def panel_trabajo():
+    """Se refresca solo mientras hay un trabajo; el resto de la página sigue disponible."""
+    trabajo = st.session_state.get("trabajo")
+    if trabajo is None:
+        return
+
+    if trabajo.futuro.done():
+        del st.session_state["trabajo"]
+        # Se comprueba el indicador y no la excepción: cada recarga del script redefine TrabajoCancelado
+        if trabajo.cancelado:
+            st.session_state["aviso"] = ("warning", "Generación cancelada.")
+        else:
+            try:
+                results = trabajo.futuro.result()
+            except Exception as e:
+                st.session_state["aviso"] = ("error", f"Error: {e}")
+            else:
+                st.session_state.setdefault("resultados", {})[trabajo.construction_type] = results
+                if trabajo.cache_key is not None:
+                    obtener_cache().guardar(trabajo.cache_key, results)
+                st.session_state.setdefault("metricas", {})[trabajo.construction_type] = trabajo.metricas
+                st.session_state["aviso"] = ("success", "¡Proceso completado!")
+        st.rerun()  # Recargar toda la página para mostrar la galería nueva
+
+    transcurrido, restante = trabajo.tiempos()
+    detalle = f"{trabajo.fase} · {trabajo.filas_hechas}/{trabajo.filas_totales} filas" if trabajo.filas_totales else trabajo.fase
+    st.progress(trabajo.fraccion(), text=f"Construcción {trabajo.construction_type}: {detalle}")
+    tiempo = f"Transcurrido: {transcurrido:.1f} s"
+    if restante is not None:
+        tiempo += f" · Restante estimado: {restante:.1f} s"
+    st.caption(tiempo)
+    st.button("✖ Cancelar", on_click=trabajo.cancelar, disabled=trabajo.cancelado)
+
+if "trabajo" in st.session_state:
+    panel_trabajo()
+
+if "aviso" in st.session_state:
+    tipo, mensaje = st.session_state.pop("aviso")
+    getattr(st, tipo)(mensaje)
 
 # --- MOSTRAR RESULTADOS (GALERÍA) ---
-output_dir = "ImagenesCreadas"
-if os.path.exists(output_dir):
-    # Obtener archivos generados actualmente
-    prefix = f"C{construction_type}_" if 'construction_type' in locals() else ""
+# Resultados de la última ejecución de la construcción elegida en esta sesión
+results = st.session_state.get("resultados", {}).get(construction_type, {})
+metricas = st.session_state.get("metricas", {}).get(construction_type)
+if show_timings and results:
+    with st.expander("⏱️ Desglose de tiempos", expanded=True):
+        if metricas is None:
+            st.caption("Resultado servido desde la caché: no hay tiempos de generación.")
+        else:
+            total = metricas["total"]
+            st.caption(f"Total: {total:.2f} s (los tramos anidados se cuentan en ambos)")
+            st.table([
+                {"Tramo": nombre, "Segundos": round(datos["segundos"], 3), "Llamadas": datos["llamadas"],
+                 "% del total": round(100 * datos["segundos"] / total, 1)}
+                for nombre, datos in metricas["tramos"].items()
+            ])
+
+if results:
+    images = sorted(results)
+    
+    st.divider()
+    st.subheader("📸 Resultados")
     
-    # Filtrar solo imágenes relevantes a la selección actual o mostrar nada si no se ha corrido
-    images = sorted([f for f in os.listdir(output_dir) if f.startswith(prefix) and f.endswith(".png")])
+    # Separar en Sombras y Stacked para mejor visualización
+    shadows_files = [img for img in images if "shadow" in img.lower() or "shadow" in img]
+    stacked_files = [img for img in images if "stacked" in img.lower() or "test" in img.lower()]
     
-    if images:
-        st.divider()
-        st.subheader("📸 Resultados")
-        
-        # Separar en Sombras y Stacked para mejor visualización
-        shadows_files = [img for img in images if "shadow" in img.lower() or "shadow" in img]
-        stacked_files = [img for img in images if "stacked" in img.lower() or "test" in img.lower()]
-        
-        if shadows_files:
-            st.write("**Sombras Generadas (Lo que recibe cada usuario):**")
-            cols = st.columns(len(shadows_files))
-            for i, img_file in enumerate(shadows_files):
-                # Mostrar en rejilla, haciendo wrap si hay muchas
-                with cols[i % len(cols)]:
-                    st.image(os.path.join(output_dir, img_file), caption=img_file, use_container_width=True)
-
-        if stacked_files:
-            st.write("**Pruebas de Apilamiento (Resultados al juntar):**")
-            # Rejilla adaptativa
-            cols_stack = st.columns(min(len(stacked_files), 3))
-            for i, img_file in enumerate(stacked_files):
-                 with cols_stack[i % 3]:
-                    st.image(os.path.join(output_dir, img_file), caption=img_file, use_container_width=True)
\ No newline at end of file
+    if shadows_files:
+        st.write("**Sombras Generadas (Lo que recibe cada usuario):**")
+        cols = st.columns(len(shadows_files))
+        for i, img_file in enumerate(shadows_files):
+            # Mostrar en rejilla, haciendo wrap si hay muchas
+            with cols[i % len(cols)]:
+                st.image(results[img_file], caption=img_file, use_container_width=True)
+
+    if stacked_files:
+        st.write("**Pruebas de Apilamiento (Resultados al juntar):**")
+        # Rejilla adaptativa
+        cols_stack = st.columns(min(len(stacked_files), 3))
+        for i, img_file in enumerate(stacked_files):
+             with cols_stack[i % 3]:
+                st.image(results[img_file], caption=img_file, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Banco de pruebas de rendimiento de las seis construcciones.
+
+Para cada caso (construcción, k, n, d, tamaño) mide en un proceso nuevo:
+  - process_images: tiempo y píxeles del secreto por segundo
+  - simulate_stacking de las k primeras sombras: tiempo y píxeles por segundo
+  - codificación PNG de las sombras: tiempo y bytes de salida
+  - pico de memoria residente (RSS) del proceso
+  - desglose por tramos (carga, sombras, apilado...) de la última repetición, solo en el JSON
+
+Los resultados se guardan en JSON y CSV para comparar versiones:
+
+    python benchmark.py                      # rejilla rápida
+    python benchmark.py --completo           # 600x400 .. 8K, n=2..12, k=2..n, d=1..5
+    python benchmark.py --comparar benchmarks/benchmark_anterior.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Construcciones"))
+
+from aleatoriedad import FuenteAleatoria
+from metricas import medir
+from registro import obtener
+
+try:
+    import resource
+except ImportError:  # Windows: sin medida de memoria pico
+    resource = None
+
+TAMANOS = {
+    "600x400": (600, 400),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+    "8K": (7680, 4320),
+}
+CAMPOS_CSV = [
+    "construccion", "k", "n", "d", "tamano", "ancho", "alto", "m",
+    "segundos_process", "pixeles_por_segundo", "subpixeles_por_segundo",
+    "segundos_apilado", "pixeles_apilado_por_segundo",
+    "segundos_png", "bytes_salida", "rss_base_mb", "rss_pico_mb", "error",
+]
+
+
+def rss_pico_mb():
+    """Memoria residente máxima del proceso actual en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux da KB y macOS bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def imagen_sintetica(ancho, alto, semilla):
+    """Imagen binaria con manchas de 16x16 (parecida a texto en cuanto a estructura)."""
+    rng = np.random.default_rng(semilla)
+    bloques = rng.random((alto // 16 + 1, ancho // 16 + 1)) < 0.5
+    return np.repeat(np.repeat(bloques, 16, axis=0), 16, axis=1)[:alto, :ancho]
+
+
+def procesar(processor, construccion, secreto, cubiertas, rng):
+    """Llama a process_images con la firma de cada construcción."""
+    if obtener(construccion).dos_cubiertas:
+        return list(processor.process_images(secreto, *cubiertas, rng=rng))
+    return processor.process_images(secreto, cubiertas, rng=rng)
+
+
+def apilar_k(processor, construccion, sombras, k):
+    """Llama a simulate_stacking sobre las k primeras sombras con la firma de cada construcción."""
+    if construccion == 6:
+        return processor.simulate_stacking(sombras[:k])
+    return processor.simulate_stacking(*sombras[:k])
+
+
+def medir_caso(caso, repeticiones, nivel_png):
+    """Se ejecuta en un proceso propio para que el pico de RSS sea solo de este caso."""
+    resultado = dict(caso, error="")
+    try:
+        ancho, alto = caso["ancho"], caso["alto"]
+        secreto = imagen_sintetica(ancho, alto, 0)
+        cubiertas = [imagen_sintetica(ancho, alto, i + 1) for i in range(caso["n"])]
+        # Los mensajes de progreso de las construcciones no forman parte de la medida
+        with contextlib.redirect_stdout(io.StringIO()):
+            processor = obtener(caso["construccion"]).crear(caso["k"], caso["n"], caso["d"])
+            resultado["rss_base_mb"] = rss_pico_mb()
+
+            tiempos, tiempos_apilado = [], []
+            for r in range(repeticiones):
+                with medir() as metricas:
+                    inicio = time.perf_counter()
+                    sombras = procesar(processor, caso["construccion"], secreto, cubiertas, FuenteAleatoria(r))
+                    tiempos.append(time.perf_counter() - inicio)
+
+                    inicio = time.perf_counter()
+                    apilar_k(processor, caso["construccion"], sombras, caso["k"])
+                    tiempos_apilado.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        bytes_salida = 0
+        for sombra in sombras:
+            buffer = io.BytesIO()
+            sombra.save(buffer, format="PNG", compress_level=nivel_png)
+            bytes_salida += buffer.tell()
+        segundos_png = time.perf_counter() - inicio
+
+        pixeles = ancho * alto
+        segundos, segundos_apilado = min(tiempos), min(tiempos_apilado)
+        resultado.update(
+            m=processor.m,
+            segundos_process=segundos,
+            pixeles_por_segundo=pixeles / segundos,
+            subpixeles_por_segundo=pixeles * processor.m * processor.n / segundos,
+            segundos_apilado=segundos_apilado,
+            pixeles_apilado_por_segundo=pixeles / segundos_apilado,
+            segundos_png=segundos_png,
+            bytes_salida=bytes_salida,
+            rss_pico_mb=rss_pico_mb(),
+            tramos=metricas.como_dict()["tramos"],
+        )
+    except Exception as e:
+        resultado["error"] = f"{type(e).__name__}: {e}"
+    return resultado
+
+
+def generar_casos(args):
+    """Rejilla de casos; se descartan los que superan --max-subpixeles de salida."""
+    parametros = []
+    for c in args.construcciones:
+        construccion = obtener(c)
+        if construccion.n_fijo is not None:
+            parametros.append((c, construccion.k_fijo, construccion.n_fijo, 1))
+        elif construccion.k_fijo is not None:
+            parametros.extend((c, construccion.k_fijo, n, 1) for n in args.n if n >= 2)
+        else:
+            parametros.extend((c, k, n, d) for n in args.n for k in args.k or range(2, n + 1) if 2 <= k <= n
+                              for d in args.d)
+
+    casos, descartados = [], 0
+    for (c, k, n, d), nombre in itertools.product(parametros, args.tamanos):
+        ancho, alto = TAMANOS[nombre]
+        if ancho * alto * obtener(c).expansion(k, n, d) * n > args.max_subpixeles:
+            descartados += 1
+            continue
+        casos.append({"construccion": c, "k": k, "n": n, "d": d, "tamano": nombre, "ancho": ancho, "alto": alto})
+    return casos, descartados
+
+
+def clave(caso):
+    return (caso["construccion"], caso["k"], caso["n"], caso["d"], caso["ancho"], caso["alto"])
+
+
+def comparar(resultados, ruta_base):
+    """Imprime la aceleración respecto a un benchmark anterior (>1 = más rápido ahora)."""
+    with open(ruta_base, encoding="utf-8") as f:
+        base = {clave(r): r for r in json.load(f)["resultados"] if not r.get("error")}
+    print(f"\nComparación con {ruta_base}:")
+    for r in resultados:
+        anterior = base.get(clave(r))
+        if anterior is None or r["error"]:
+            continue
+        print(f"  C{r['construccion']} k={r['k']} n={r['n']} d={r['d']} {r['tamano']:>8}: "
+              f"process x{r['pixeles_por_segundo'] / anterior['pixeles_por_segundo']:.2f} | "
+              f"apilado x{r['pixeles_apilado_por_segundo'] / anterior['pixeles_apilado_por_segundo']:.2f} | "
+              f"bytes x{r['bytes_salida'] / anterior['bytes_salida']:.2f}")
+
+
+def entorno():
+    """Datos de la máquina y la versión para poder comparar resultados."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las construcciones CBW-EVCS.")
+    parser.add_argument("--completo", action="store_true",
+                        help="Rejilla completa: 600x400 a 8K, n=2..12, k=2..n, d=1..5.")
+    parser.add_argument("--construcciones", type=int, nargs="+", default=[1, 2, 3, 4, 5, 6])
+    parser.add_argument("--tamanos", nargs="+", choices=list(TAMANOS))
+    parser.add_argument("--n", type=int, nargs="+")
+    parser.add_argument("--k", type=int, nargs="+", help="Umbrales de C6 (por defecto 2..n).")
+    parser.add_argument("--d", type=int, nargs="+")
+    parser.add_argument("--repeticiones", type=int, default=1, help="Se guarda el mejor tiempo.")
+    parser.add_argument("--nivel-png", type=int, default=1, help="Nivel de compresión zlib de los PNG.")
+    parser.add_argument("--max-subpixeles", type=float, default=5e8,
+                        help="Descarta los casos con más subpíxeles de salida (acota la memoria).")
+    parser.add_argument("-o", "--salida", default="benchmarks", help="Carpeta de resultados.")
+    parser.add_argument("--comparar", help="JSON de un benchmark anterior con el que comparar.")
+    args = parser.parse_args(argv)
+
+    if args.completo:
+        args.tamanos = args.tamanos or list(TAMANOS)
+        args.n = args.n or list(range(2, 13))
+        args.d = args.d or [1, 2, 3, 4, 5]
+    else:
+        args.tamanos = args.tamanos or ["600x400", "1080p"]
+        args.n = args.n or [3, 6]
+        args.k = args.k or [2, 3]
+        args.d = args.d or [3]
+
+    casos, descartados = generar_casos(args)
+    print(f"{len(casos)} casos ({descartados} descartados por superar {args.max_subpixeles:.0e} subpíxeles)")
+
+    resultados = []
+    contexto = multiprocessing.get_context("spawn")
+    for i, caso in enumerate(casos, 1):
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+            r = pool.submit(medir_caso, caso, args.repeticiones, args.nivel_png).result()
+        resultados.append(r)
+        if r["error"]:
+            print(f"[{i}/{len(casos)}] C{r['construccion']} k={r['k']} n={r['n']} d={r['d']} {r['tamano']}: {r['error']}")
+            continue
+        rss = f"{r['rss_pico_mb']:.0f} MB" if r["rss_pico_mb"] is not None else "n/d"
+        print(f"[{i}/{len(casos)}] C{r['construccion']} k={r['k']} n={r['n']} d={r['d']} {r['tamano']:>8} (m={r['m']}): "
+              f"{r['pixeles_por_segundo'] / 1e6:.2f} Mpx/s | apilado {r['pixeles_apilado_por_segundo'] / 1e6:.2f} Mpx/s | "
+              f"{r['bytes_salida'] / 1e6:.1f} MB PNG | RSS {rss}")
+
+    os.makedirs(args.salida, exist_ok=True)
+    base = os.path.join(args.salida, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}")
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump({"entorno": entorno(), "resultados": resultados}, f, indent=2, ensure_ascii=False)
+    with open(base + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CAMPOS_CSV, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(resultados)
+    print(f"\nResultados guardados en {base}.json y {base}.csv")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
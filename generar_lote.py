@@ -0,0 +1,181 @@
+"""
+Generación masiva de sombras desde la línea de comandos.
+
+Lee un manifiesto JSON con muchos trabajos (secreto, cubiertas, construcción, k, n)
+y los reparte en un pool de procesos. Cada trabajo escribe sus sombras en su
+propia carpeta y al final se informa del rendimiento global.
+
+Ejemplo de manifiesto (las rutas relativas se resuelven desde su carpeta):
+
+    {
+      "trabajos": [
+        {"construccion": 1, "secreto": "secret.png", "cubiertas": ["c1.png", "c2.png"]},
+        {"nombre": "banco", "construccion": 6, "k": 3, "n": 4, "d": 3, "semilla": 7,
+         "secreto": "secret.png", "cubiertas": ["c1.png", "c2.png", "c3.png", "c4.png"]}
+      ]
+    }
+
+Uso:
+    python generar_lote.py manifiesto.json -o Lotes/salida -w 4 --apilar
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Construcciones"))
+
+from aleatoriedad import FuenteAleatoria, MODOS
+from apilamiento import apilar
+from bandas import ALTO_BANDA, generar_por_bandas, sin_limite_pixeles
+from comun import UMBRAL, abrir_imagen
+from metricas import medir
+from registro import obtener
+
+
+def leer_manifiesto(ruta):
+    """Devuelve la lista de trabajos normalizados (rutas absolutas, k/n/d por defecto)."""
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    trabajos = datos["trabajos"] if isinstance(datos, dict) else datos
+    base = os.path.dirname(os.path.abspath(ruta))
+
+    normalizados = []
+    for i, t in enumerate(trabajos):
+        cubiertas = [os.path.join(base, c) for c in t["cubiertas"]]
+        construccion = int(t["construccion"])
+        n = int(t.get("n", len(cubiertas)))
+        k = int(t.get("k", 2))
+        d = int(t.get("d", 3))
+        nombre = t.get("nombre") or f"{i + 1:04d}_C{construccion}_k{k}_n{n}"
+        normalizados.append({
+            "nombre": nombre,
+            "construccion": construccion,
+            "k": k, "n": n, "d": d,
+            "semilla": t.get("semilla"),
+            "secreto": os.path.join(base, t["secreto"]),
+            "cubiertas": cubiertas,
+        })
+    return normalizados
+
+
+def ejecutar_trabajo(trabajo, salida, modo, apilar_pruebas, alto_banda, umbral=UMBRAL):
+    """
+    Ejecuta un trabajo en un proceso del pool y devuelve su informe.
+    Las sombras se generan por bandas (memoria acotada) directamente en
+    <salida>/<nombre>/sombra{i}.png; con 'apilar_pruebas' se añaden los
+    apilados de las k primeras sombras y de todas. El informe incluye el
+    desglose de tiempos por tramos.
+    """
+    inicio = time.perf_counter()
+    informe = dict(trabajo, ok=False)
+    carpeta = os.path.join(salida, trabajo["nombre"])
+    carpeta_nueva = False
+    try:
+        with medir() as metricas:
+            construccion = obtener(trabajo["construccion"])
+            processor = construccion.crear(trabajo["k"], trabajo["n"], trabajo["d"])
+            if len(trabajo["cubiertas"]) != processor.n:
+                raise ValueError(f"Se esperaban {processor.n} cubiertas y hay {len(trabajo['cubiertas'])}.")
+            carpeta_nueva = not os.path.isdir(carpeta)
+            os.makedirs(carpeta, exist_ok=True)
+
+            rutas = [os.path.join(carpeta, f"sombra{i + 1}.png") for i in range(processor.n)]
+            fuente = FuenteAleatoria(trabajo["semilla"], modo)
+            if not generar_por_bandas(processor, trabajo["secreto"], trabajo["cubiertas"], rutas, alto_banda, fuente,
+                                      umbral):
+                raise ValueError("Parámetros de generación no válidos.")
+
+            # Las entradas son ficheros propios: sin el límite de píxeles de PIL.
+            # Los apilados de prueba sí cargan las sombras completas en memoria.
+            with sin_limite_pixeles():
+                if apilar_pruebas:
+                    exacto = construccion.exacto
+                    sombras = [abrir_imagen(r) for r in rutas]
+                    pruebas = {f"apilado_{trabajo['k']}_de_{processor.n}.png": sombras[:trabajo["k"]]}
+                    if processor.n > trabajo["k"]:
+                        pruebas[f"apilado_{processor.n}_de_{processor.n}.png"] = sombras
+                    for nombre, subconjunto in pruebas.items():
+                        ruta = os.path.join(carpeta, nombre)
+                        apilar(subconjunto, exacto).save(ruta)
+                        rutas.append(ruta)
+
+                with abrir_imagen(trabajo["secreto"]) as secreto:
+                    ancho, alto = secreto.size
+            informe.update(
+                ok=True,
+                pixeles_secreto=ancho * alto,
+                subpixeles=ancho * alto * processor.m * processor.n,
+                bytes_escritos=sum(os.path.getsize(r) for r in rutas),
+                ficheros=[os.path.relpath(r, salida) for r in rutas],
+            )
+    except Exception as e:
+        informe["error"] = f"{type(e).__name__}: {e}"
+        # Un trabajo fallido no deja su carpeta (si la ha creado él) a medio llenar
+        if carpeta_nueva:
+            shutil.rmtree(carpeta, ignore_errors=True)
+    informe["segundos"] = time.perf_counter() - inicio
+    informe["tramos"] = metricas.como_dict()["tramos"]
+    return informe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera sombras CBW-EVCS en lote a partir de un manifiesto JSON.")
+    parser.add_argument("manifiesto", help="Fichero JSON con la lista de trabajos.")
+    parser.add_argument("-o", "--salida", default="Lotes", help="Carpeta raíz de salida (una subcarpeta por trabajo).")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Trabajos en paralelo.")
+    parser.add_argument("--modo", choices=MODOS, default="contador", help="Modo de la fuente aleatoria.")
+    parser.add_argument("--apilar", action="store_true", help="Guardar también los apilados de prueba.")
+    parser.add_argument("--alto-banda", type=int, default=ALTO_BANDA, help="Filas por banda en la generación.")
+    parser.add_argument("--umbral", type=int, default=UMBRAL,
+                        help="Nivel de gris (0-255) desde el que una entrada es blanca; -1 = difuminado de PIL.")
+    args = parser.parse_args(argv)
+
+    trabajos = leer_manifiesto(args.manifiesto)
+    os.makedirs(args.salida, exist_ok=True)
+    print(f"{len(trabajos)} trabajos, {args.workers} procesos -> {args.salida}")
+
+    inicio = time.perf_counter()
+    informes = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futuros = [pool.submit(ejecutar_trabajo, t, args.salida, args.modo, args.apilar, args.alto_banda,
+                               None if args.umbral < 0 else args.umbral)
+                   for t in trabajos]
+        for futuro in as_completed(futuros):
+            informe = futuro.result()
+            informes.append(informe)
+            estado = "OK" if informe["ok"] else f"ERROR ({informe['error']})"
+            print(f"[{len(informes)}/{len(trabajos)}] {informe['nombre']}: {estado} en {informe['segundos']:.2f} s")
+    total = time.perf_counter() - inicio
+
+    correctos = [i for i in informes if i["ok"]]
+    pixeles = sum(i["pixeles_secreto"] for i in correctos)
+    subpixeles = sum(i["subpixeles"] for i in correctos)
+    bytes_escritos = sum(i["bytes_escritos"] for i in correctos)
+    resumen = {
+        "trabajos": len(informes),
+        "correctos": len(correctos),
+        "errores": len(informes) - len(correctos),
+        "segundos": total,
+        "trabajos_por_segundo": len(correctos) / total,
+        "pixeles_secreto_por_segundo": pixeles / total,
+        "subpixeles_por_segundo": subpixeles / total,
+        "bytes_escritos": bytes_escritos,
+        "informes": sorted(informes, key=lambda i: i["nombre"]),
+    }
+    with open(os.path.join(args.salida, "resumen.json"), "w", encoding="utf-8") as f:
+        json.dump(resumen, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{len(correctos)}/{len(informes)} trabajos correctos en {total:.2f} s")
+    print(f" -> {resumen['trabajos_por_segundo']:.2f} trabajos/s | "
+          f"{resumen['pixeles_secreto_por_segundo'] / 1e6:.2f} Mpx secreto/s | "
+          f"{resumen['subpixeles_por_segundo'] / 1e6:.2f} Msubpx sombra/s | "
+          f"{bytes_escritos / 1e6:.1f} MB escritos")
+    return 0 if len(correctos) == len(informes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())